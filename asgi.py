@@ -0,0 +1,62 @@
+# Punto de entrada ASGI de GuardiaPass:
+#
+#     uvicorn asgi:app --workers 4
+#
+# Requiere las dependencias opcionales asgiref y un servidor ASGI (uvicorn,
+# hypercorn...). La aplicación Flask sigue siendo WSGI: cada petición se ejecuta
+# en un hilo propio y el número de peticiones en curso se limita con
+# ASGI_MAX_CONCURRENCY; las que superan el límite esperan en el bucle de eventos
+# sin ocupar ningún hilo. La derivación de claves y el cifrado en lote ya se
+# ejecutan en sus propios pools acotados (KDF_WORKERS, CRYPTO_WORKERS).
+import asyncio
+import os
+
+try:
+    from asgiref.sync import ThreadSensitiveContext
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError('El modo ASGI requiere asgiref: pip install asgiref uvicorn') from e
+
+from run import create_app
+
+
+class BoundedWsgiToAsgi:
+    """
+    Adaptador WSGI -> ASGI que ejecuta cada petición en su propio hilo.
+
+    WsgiToAsgi, fuera de un ThreadSensitiveContext, ejecuta todas las peticiones
+    en un único hilo compartido; abrir un contexto por petición las reparte en
+    hilos distintos y el semáforo acota cuántos hay a la vez.
+    """
+
+    def __init__(self, wsgi_application, max_concurrency=32):
+        self.application = WsgiToAsgi(wsgi_application)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            # Flask no tiene eventos de arranque/parada que atender
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        if self._semaphore is None:
+            # Se crea dentro del bucle de eventos del servidor
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            async with ThreadSensitiveContext():
+                await self.application(scope, receive, send)
+
+
+def create_asgi_app(config_name='default'):
+    """Crea la aplicación Flask y la envuelve como aplicación ASGI"""
+    flask_app = create_app(config_name)
+    return BoundedWsgiToAsgi(flask_app, flask_app.config.get('ASGI_MAX_CONCURRENCY', 32))
+
+
+app = create_asgi_app(os.getenv('FLASK_ENV') or 'default')
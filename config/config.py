@@ -12,17 +12,122 @@ class Config:
     DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'passwords.db')
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,  # Conexiones persistentes (una por hilo concurrente)
+        'max_overflow': 10,
+        'pool_timeout': 10,  # Segundos esperando una conexión libre
+        'pool_recycle': 3600
+    }
     
+    # PRAGMA aplicados a cada conexión SQLite
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Los lectores no bloquean al escritor ni viceversa
+        'synchronous': 'NORMAL',  # Seguro con WAL y evita un fsync por transacción
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),  # ms esperando el bloqueo antes de 'database is locked'
+        'cache_size': -20000,  # Negativo = KiB (~20 MB de caché de páginas)
+        'mmap_size': 268435456,  # 256 MB de lectura mapeada en memoria
+        'temp_store': 'MEMORY'
+    }
+    
+    # Sharding por usuario: las tablas de la bóveda (password, password_tombstone,
+    # vault_version) se reparten en SHARD_COUNT ficheros SQLite (user_id % SHARD_COUNT),
+    # cada uno con su propio escritor. 0 = todo en la base de datos central.
+    # Para activarlo sobre datos existentes: scripts/split_shards.py
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0))
+    SHARD_DIRECTORY = os.getenv('SHARD_DIRECTORY')  # Por defecto, junto a DATABASE_PATH
+    SHARD_FILENAME = 'passwords_shard{index}.db'
+
     # Configuración de la contraseña
     PASSWORD_MIN_LENGTH = 12
     PASSWORD_MAX_LENGTH = 60
     
     # Configuración de seguridad
-    PBKDF2_ITERATIONS = 100000  # Número de iteraciones para la derivación de claves
+    # Parámetros de derivación de claves para usuarios nuevos (calibrar con scripts/calibrate_kdf.py)
+    KDF_ALGORITHM = os.getenv('KDF_ALGORITHM', 'pbkdf2-sha256')  # 'pbkdf2-sha256' o 'scrypt'
+    PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', 100000))  # Número de iteraciones para la derivación de claves
     SALT_LENGTH = 32  # Longitud del salt en bytes
+    SCRYPT_N = int(os.getenv('SCRYPT_N', 2 ** 15))  # Coste de CPU/memoria de scrypt (potencia de 2)
+    SCRYPT_R = 8  # Tamaño de bloque de scrypt
+    SCRYPT_P = 1  # Paralelismo de scrypt
+    
+    # Pool de procesos para PBKDF2 y hashes de contraseñas
+    KDF_WORKERS = int(os.getenv('KDF_WORKERS', os.cpu_count() or 1))  # 0 = ejecutar en el hilo de la petición
+    KDF_MAX_QUEUE = int(os.getenv('KDF_MAX_QUEUE', 32))  # Tareas en espera antes de responder 503
+    KDF_RETRY_AFTER = 2  # Segundos sugeridos en la cabecera Retry-After
+    
+    # Formato de cifrado para escrituras nuevas: 'aesgcm', 'chacha20' o 'fernet'
+    # (los tokens Fernet existentes se leen siempre y se migran al reescribirse)
+    CIPHER_FORMAT = os.getenv('CIPHER_FORMAT', 'aesgcm')
+    
+    # Caché de encriptadores por clave maestra
+    CIPHER_CACHE_SIZE = int(os.getenv('CIPHER_CACHE_SIZE', 256))  # Número máximo de claves en caché
+    CIPHER_CACHE_TTL = int(os.getenv('CIPHER_CACHE_TTL', 900))  # Segundos antes de descartar una entrada
+    
+    # Encriptación en lote
+    CRYPTO_WORKERS = int(os.getenv('CRYPTO_WORKERS', min(4, os.cpu_count() or 1)))  # Hilos del pool de encriptación
+    CRYPTO_PARALLEL_THRESHOLD = 256  # Elementos a partir de los cuales se usa el pool
+    REVEAL_MAX_IDS = 100  # Máximo de contraseñas desencriptadas por petición de revelado
+    
+    # Paginación del listado de contraseñas (?limit=&cursor=)
+    PAGE_SIZE_DEFAULT = 100
+    PAGE_SIZE_MAX = 500
+    SEARCH_PAGE_SIZE = 20  # Resultados por página en /api/passwords/search
+    
+    # Máximo de contraseñas por petición a POST /api/passwords/bulk
+    BULK_CREATE_MAX = 1000
+    
+    # Filas leídas y descifradas por bloque en GET /api/passwords/export
+    EXPORT_CHUNK_SIZE = 500
+    
+    # Listados completos en streaming: filas leídas y descifradas por bloque y
+    # bytes de JSON acumulados antes de enviar cada fragmento
+    LISTING_CHUNK_SIZE = 500
+    JSON_STREAM_BUFFER = 65536
+    
+    # Estadísticas del perfil y de GET /api/stats (se invalidan al escribir)
+    STATS_CACHE_SIZE = 1024  # Usuarios con estadísticas en caché
+    STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', 300))  # Segundos; cubre las contraseñas que pasan a ser antiguas
+    STATS_OLD_DAYS = 90  # Días a partir de los cuales una contraseña es antigua
+    
+    # Identidades cacheadas por el user_loader (sólo ID y nombre, sin secretos)
+    IDENTITY_CACHE_SIZE = 4096
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 300))  # Segundos
+    
+    # Metadatos de la bóveda por usuario en memoria (sin contraseñas), actualizados
+    # al escribir y validados con la versión de la bóveda en cada lectura
+    VAULT_CACHE_MAX_BYTES = int(os.getenv('VAULT_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 0 = desactivada
+    VAULT_CACHE_MAX_ROWS = 5000  # Las bóvedas más grandes se leen siempre de SQLite
+    
+    # Registro de actividad (tabla activity_log): las peticiones sólo encolan el
+    # registro y un hilo lo escribe por lotes de BATCH_SIZE o cada FLUSH_INTERVAL
+    ACTIVITY_LOG_MODE = os.getenv('ACTIVITY_LOG_MODE', 'async')  # 'async', 'sync' u 'off'
+    ACTIVITY_LOG_BATCH_SIZE = 200
+    ACTIVITY_LOG_FLUSH_INTERVAL = 1.0  # Segundos
+    ACTIVITY_LOG_MAX_QUEUE = 10000  # Registros pendientes; con la cola llena se descartan
+    ACTIVITY_LOG_SHUTDOWN_POLICY = 'flush'  # Al parar: 'flush' (escribir lo pendiente) o 'drop'
+    ACTIVITY_LOG_RETENTION_DAYS = 365  # 0 = conservar siempre
+    
+    # Compresión de respuestas HTML/JSON (brotli si está instalado, si no gzip)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = 1024  # Bytes; las respuestas menores se envían sin comprimir
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5
+    COMPRESSION_STREAMING = True  # Comprimir también los listados en streaming, fragmento a fragmento
+    
+    # Peticiones atendidas a la vez en modo ASGI (asgi.py), cada una en su hilo
+    ASGI_MAX_CONCURRENCY = int(os.getenv('ASGI_MAX_CONCURRENCY', 32))
+    
+    # GET /api/metrics (contadores de todo el proceso; requiere iniciar sesión)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
     
     # Configuración de la sesión
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutos en segundos
+    # Almacén de sesiones: 'sqlite' (tabla session_record, válido con varios procesos),
+    # 'memory' (un único proceso) o 'cookie' (todos los datos en la cookie firmada)
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+    SESSION_MEMORY_MAX = 10000  # Sesiones como máximo en el backend 'memory'
+    SESSION_SWEEP_INTERVAL = 300  # Segundos entre limpiezas de sesiones caducadas
+    SESSION_TOUCH_INTERVAL = 60  # Segundos mínimos entre renovaciones de la caducidad
     SESSION_COOKIE_HTTPONLY = True  # No permitir acceso JS a la cookie
 
 class DevelopmentConfig(Config):
@@ -32,6 +137,7 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     SESSION_COOKIE_SECURE = True  # Requerir HTTPS en producción
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'  # Desactivado salvo que se pida
     
     @classmethod
     def init_app(cls, app):
@@ -43,6 +149,11 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'  # Usar base de datos en memoria para tests
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # La base en memoria usa una única conexión compartida
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, journal_mode='MEMORY')  # WAL no aplica en memoria
+    KDF_WORKERS = 0  # Sin pool de procesos en los tests
+    SESSION_BACKEND = 'memory'  # Sesiones en el servidor sin tocar la base de datos
+    ACTIVITY_LOG_MODE = 'sync'  # La base en memoria no admite un segundo hilo escritor
 
 # En el caso de que pasara a producción o hubiera diversas fases.
 config = {
@@ -1,17 +1,121 @@
 import sqlite3
 from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text, event
+import re
+from .sharding import ShardedSession, configure_shards, shard_bind_key, shard_indexes, use_shard, SHARDED_TABLES
 
-db = SQLAlchemy()
+# La sesión dirige las tablas de la bóveda al shard del usuario (SHARD_COUNT > 0)
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 
 def init_app(app):
     """Inicializa los modelos con la aplicación"""
+    configure_shards(app)
     db.init_app(app)
     
     # Importar modelos después de crear db para evitar importaciones circulares
     from .user import User
     from .password import Password
+    from .key_rotation import KeyRotation
+    from .tombstone import PasswordTombstone
+    from .session import SessionRecord
+    from .activity import ActivityLog
+    from .vault import VaultVersion
+    from .search import init_search_index
     
-    # Crear todas las tablas
+    # Crear todas las tablas y añadir las columnas nuevas a las existentes
     with app.app_context():
-        db.create_all()
\ No newline at end of file
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS', {}))
+        log_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS', {}))
+        db.create_all()
+        upgrade_schema()
+        VaultVersion.import_legacy_versions()
+        init_search_index()
+        
+        # Cada shard guarda sólo las tablas de la bóveda, con su propio índice de búsqueda
+        sharded_tables = [db.metadata.tables[name] for name in SHARDED_TABLES]
+        for index in shard_indexes():
+            if index is not None:
+                engine = db.engines[shard_bind_key(index)]
+                db.metadata.create_all(engine, tables=sharded_tables)
+                upgrade_schema(engine, sharded_tables)
+                init_search_index(engine)
+            with use_shard(index):
+                Password.backfill_domains()
+                Password.backfill_updated_at()
+        
+        from .stats import init_stats
+        init_stats(app)
+        
+        from .identity import init_identity
+        init_identity(app)
+        
+        from .vault_cache import init_vault_cache
+        init_vault_cache(app)
+        
+        from .activity import init_activity
+        init_activity(app)
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Registra un hook que ejecuta los PRAGMA configurados en cada conexión
+    nueva del motor (WAL, synchronous, busy_timeout, caché, mmap...).
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    for name, value in pragmas.items():
+        if not re.fullmatch(r'[a-z_]+', name) or not re.fullmatch(r'-?\w+', str(value)):
+            raise ValueError(f'PRAGMA no válido: {name}={value}')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+def log_sqlite_pragmas(engine, pragmas):
+    """Registra en el log los valores efectivos de los PRAGMA configurados"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    with engine.connect() as connection:
+        effective = {
+            name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in pragmas
+        }
+    current_app.logger.info(f'SQLite PRAGMA efectivos: {effective}')
+    if 'journal_mode' in pragmas and str(effective['journal_mode']).lower() != str(pragmas['journal_mode']).lower():
+        current_app.logger.warning(
+            f"PRAGMA journal_mode configurado como {pragmas['journal_mode']} pero vale {effective['journal_mode']}"
+        )
+
+def upgrade_schema(engine=None, tables=None):
+    """
+    Añade a las tablas existentes las columnas e índices que se han incorporado
+    a los modelos después de crearlas (create_all no altera tablas ya creadas).
+    Por defecto revisa todas las tablas de la base de datos central.
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in tables or db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                connection.execute(text(ddl))
+                current_app.logger.info(f'Columna añadida: {table.name}.{column.name}')
+            
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    current_app.logger.info(f'Índice creado: {index.name}')
\ No newline at end of file
@@ -0,0 +1,159 @@
+import atexit
+from datetime import datetime, timedelta
+from flask import has_request_context, request
+from flask_login import current_user
+from sqlalchemy import insert, delete
+from . import db
+from utils.batch_writer import BatchWriter
+
+class ActivityLog(db.Model):
+    """
+    Registro de accesos y cambios en la bóveda (inicios de sesión, listados,
+    revelados, exportaciones, altas, modificaciones y eliminaciones).
+
+    Las filas se escriben por lotes desde activity_writer, fuera de la
+    transacción de la petición.
+    """
+    __tablename__ = 'activity_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    action = db.Column(db.String(20), nullable=False)
+    password_id = db.Column(db.Integer)
+    target = db.Column(db.String(200))  # Nombre de la contraseña en el momento de la acción
+    count = db.Column(db.Integer)  # Entradas afectadas en las acciones sobre varias
+    ip = db.Column(db.String(45))
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.Index('ix_activity_log_user_created', 'user_id', 'created_at'),
+    )
+
+    # Texto de cada acción en el perfil
+    ACTION_LABELS = {
+        'login': 'Inicio de sesión',
+        'logout': 'Cierre de sesión',
+        'list': 'Listado',
+        'view': 'Consultada',
+        'reveal': 'Revelada',
+        'search': 'Búsqueda',
+        'sync': 'Sincronización',
+        'export': 'Exportación',
+        'create': 'Creada',
+        'update': 'Modificada',
+        'delete': 'Eliminada'
+    }
+
+    @staticmethod
+    def write_batch(records):
+        """Inserta un lote de registros con una sola sentencia y un único commit"""
+        with db.engine.begin() as connection:
+            connection.execute(insert(ActivityLog.__table__), records)
+
+    @staticmethod
+    def purge_before(cutoff):
+        """Elimina los registros anteriores a una fecha"""
+        with db.engine.begin() as connection:
+            return connection.execute(
+                delete(ActivityLog.__table__).where(ActivityLog.__table__.c.created_at < cutoff)
+            ).rowcount
+
+    @staticmethod
+    def recent_for_user(user_id, limit=5):
+        """Obtiene la actividad más reciente del usuario, de la más nueva a la más antigua"""
+        return ActivityLog.query.filter_by(user_id=user_id).order_by(
+            ActivityLog.created_at.desc(), ActivityLog.id.desc()
+        ).limit(limit).all()
+
+    def to_dict(self):
+        """Convierte el registro a un diccionario (date, site y action, como en el perfil)"""
+        return {
+            'date': self.created_at,
+            'site': self.target or '',
+            'action': ActivityLog.ACTION_LABELS.get(self.action, self.action),
+            'type': self.action,
+            'password_id': self.password_id,
+            'count': self.count
+        }
+
+
+activity_settings = {
+    'mode': 'async',  # 'async' (por lotes en segundo plano), 'sync' o 'off'
+    'retention_days': 365,
+    'purge_interval': 3600,  # Segundos mínimos entre purgas de registros antiguos
+    'last_purge': 0.0,
+    'atexit': False
+}
+
+activity_writer = BatchWriter(name='activity-log')
+
+
+def init_activity(app):
+    """Configura el registro de actividad a partir de la configuración de Flask"""
+    activity_settings.update(
+        mode=app.config.get('ACTIVITY_LOG_MODE', activity_settings['mode']),
+        retention_days=app.config.get('ACTIVITY_LOG_RETENTION_DAYS', activity_settings['retention_days'])
+    )
+
+    def write(records):
+        # El hilo escritor no tiene contexto de aplicación propio
+        with app.app_context():
+            ActivityLog.write_batch(records)
+            _purge_expired(records[-1]['created_at'])
+
+    activity_writer.configure(
+        write_batch=write,
+        max_queue=app.config.get('ACTIVITY_LOG_MAX_QUEUE', 10000),
+        batch_size=app.config.get('ACTIVITY_LOG_BATCH_SIZE', 200),
+        interval=app.config.get('ACTIVITY_LOG_FLUSH_INTERVAL', 1.0),
+        shutdown_policy=app.config.get('ACTIVITY_LOG_SHUTDOWN_POLICY', 'flush')
+    )
+    if activity_settings['mode'] == 'async' and not activity_settings['atexit']:
+        atexit.register(activity_writer.close)
+        activity_settings['atexit'] = True
+
+
+def _purge_expired(now):
+    days = activity_settings['retention_days']
+    if not days or now.timestamp() - activity_settings['last_purge'] < activity_settings['purge_interval']:
+        return
+    activity_settings['last_purge'] = now.timestamp()
+    ActivityLog.purge_before(now - timedelta(days=days))
+
+
+def log_activity(action, password=None, user_id=None, count=None, password_id=None, target=None):
+    """
+    Registra una acción del usuario (por defecto el autenticado). En modo
+    'async' sólo encola el registro; la escritura se hace por lotes.
+
+    Args:
+        action (str): Clave de ActivityLog.ACTION_LABELS
+        password (Password, optional): Contraseña afectada
+        user_id (int, optional): Usuario, si no es el de la petición
+        count (int, optional): Entradas afectadas
+        password_id (int, optional): ID de la contraseña, si ya no existe la fila
+        target (str, optional): Nombre de la contraseña, si ya no existe la fila
+    """
+    mode = activity_settings['mode']
+    if mode == 'off':
+        return
+    if user_id is None:
+        user_id = current_user.id
+    record = {
+        'user_id': user_id,
+        'action': action,
+        'password_id': password.id if password is not None else password_id,
+        'target': password.name if password is not None else target,
+        'count': count,
+        'ip': request.remote_addr if has_request_context() else None,
+        'created_at': datetime.utcnow()
+    }
+    if mode == 'sync':
+        activity_writer.write_now(record)
+    else:
+        activity_writer.submit(record)
+
+
+def recent_activity(user_id, limit=5):
+    """Actividad reciente del usuario para el perfil y las estadísticas"""
+    return [entry.to_dict() for entry in ActivityLog.recent_for_user(user_id, limit)]
@@ -0,0 +1,58 @@
+from flask_login import UserMixin
+from sqlalchemy import event
+from utils.ttl_cache import TTLCache
+from .user import User
+
+class UserIdentity(UserMixin):
+    """
+    Identidad mínima del usuario autenticado que devuelve el user_loader.
+
+    Sólo contiene lo necesario para la autenticación (ID y nombre); la clave
+    maestra y el hash de la contraseña nunca se guardan en la caché. La clave
+    maestra de la sesión está en session['master_key'].
+    """
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+    def __repr__(self):
+        return f'<UserIdentity {self.id}>'
+
+
+# Identidades por ID de usuario, para no consultar la tabla user en cada petición
+identity_cache = TTLCache(maxsize=4096, ttl=300)
+
+
+def init_identity(app):
+    """Configura la caché de identidades a partir de la configuración de Flask"""
+    identity_cache.configure(
+        maxsize=app.config.get('IDENTITY_CACHE_SIZE', 4096),
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 300)
+    )
+
+
+def _fetch_identity(user_id):
+    row = User.query.with_entities(User.id, User.username).filter_by(id=user_id).first()
+    return UserIdentity(row.id, row.username) if row is not None else None
+
+
+def load_identity(user_id):
+    """
+    Obtiene la identidad de un usuario desde la caché o la base de datos.
+
+    Returns:
+        UserIdentity: Identidad del usuario, o None si no existe
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return identity_cache.get(user_id, _fetch_identity)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_identity(mapper, connection, target):
+    """Descarta la identidad cacheada cuando el usuario cambia o se elimina"""
+    identity_cache.invalidate(target.id)
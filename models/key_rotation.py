@@ -0,0 +1,197 @@
+from . import db
+from .user import User
+from datetime import datetime
+from sqlalchemy import update, bindparam, or_
+from cryptography.fernet import Fernet
+from utils.encryptor import PasswordEncryptor, cipher_cache, key_digest
+from utils.kdf_executor import kdf_executor, derive_user_secrets
+
+class KeyRotation(db.Model):
+    """
+    Progreso de la rotación de la clave maestra de un usuario.
+
+    Las contraseñas se re-cifran por bloques ordenados por ID y cada bloque se
+    confirma junto con su punto de control (last_id), de modo que una rotación
+    interrumpida se reanuda desde el último bloque confirmado.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='running')
+    new_master_key = db.Column(db.String(500))
+    new_kdf_params = db.Column(db.JSON)
+    new_kdf_salt = db.Column(db.LargeBinary)
+    old_key_hash = db.Column(db.String(64))
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    rotated = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def get_active(user_id):
+        """Obtiene la rotación en curso de un usuario, si la hay"""
+        return KeyRotation.query.filter_by(user_id=user_id, status='running').first()
+
+    @staticmethod
+    def resolve_keys(user_id, master_key):
+        """
+        Determina con qué clave cifrar y con qué claves intentar descifrar.
+
+        Durante una rotación se cifra con la clave nueva y se descifra probando
+        la nueva y después la anterior. Si la clave recibida es de una sesión
+        iniciada antes de una rotación ya terminada, se usa la clave actual
+        del usuario.
+
+        Returns:
+            tuple: (str, list) Clave de cifrado y claves de descifrado en orden
+        """
+        rotations = KeyRotation.query.filter(
+            KeyRotation.user_id == user_id,
+            or_(
+                KeyRotation.status == 'running',
+                KeyRotation.old_key_hash == key_digest(master_key)
+            )
+        ).all()
+        for rotation in rotations:
+            if rotation.status == 'running':
+                return rotation.new_master_key, [rotation.new_master_key, master_key]
+        if rotations:
+            current_key = db.session.query(User.master_key).filter_by(id=user_id).scalar()
+            return current_key, [current_key]
+        return master_key, [master_key]
+
+    @staticmethod
+    def start(user, master_password=None):
+        """
+        Inicia (o devuelve, si ya existe) la rotación de la clave de un usuario.
+
+        Args:
+            user (User): Usuario cuya clave se rota
+            master_password (str, optional): Si se indica, la clave nueva se
+                deriva de ella con los parámetros de KDF configurados; si no,
+                se genera una clave aleatoria
+
+        Returns:
+            KeyRotation: Rotación en curso
+        """
+        rotation = KeyRotation.get_active(user.id)
+        if rotation is not None:
+            return rotation
+
+        if master_password is not None:
+            kdf_params = PasswordEncryptor.default_kdf_params()
+            new_key, salt, _ = kdf_executor.run(derive_user_secrets, master_password, kdf_params)
+        else:
+            kdf_params, salt = None, None
+            new_key = Fernet.generate_key()
+
+        rotation = KeyRotation(
+            user_id=user.id,
+            new_master_key=new_key.decode(),
+            new_kdf_params=kdf_params,
+            new_kdf_salt=salt,
+            old_key_hash=key_digest(user.master_key)
+        )
+        try:
+            db.session.add(rotation)
+            db.session.commit()
+            return rotation
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error starting key rotation: {str(e)}")
+            raise
+
+    def run_chunk(self, chunk_size=500):
+        """
+        Re-cifra el siguiente bloque de contraseñas y guarda el punto de control.
+
+        Returns:
+            int: Número de filas procesadas (0 cuando la rotación ha terminado)
+        """
+        from .password import Password
+
+        user = User.get(self.user_id)
+        rows = db.session.query(Password.id, Password.encrypted_password).filter(
+            Password.user_id == self.user_id,
+            Password.id > self.last_id
+        ).order_by(Password.id).limit(chunk_size).all()
+        if not rows:
+            self._finish(user)
+            return 0
+
+        old_encryptor = PasswordEncryptor.for_key(user.master_key)
+        new_encryptor = PasswordEncryptor.for_key(self.new_master_key)
+
+        tokens = [row.encrypted_password for row in rows]
+        plaintexts, errors = old_encryptor.decrypt_many(tokens)
+        if errors:
+            # Filas escritas con la clave nueva mientras la rotación estaba en curso
+            failed_indexes = list(errors)
+            retried, retry_errors = new_encryptor.decrypt_many(tokens[i] for i in failed_indexes)
+            for index, plaintext in zip(failed_indexes, retried):
+                plaintexts[index] = plaintext
+            for position in retry_errors:
+                print(f"Error rotating password {rows[failed_indexes[position]].id}: {str(retry_errors[position])}")
+
+        pending = [(row, plaintext) for row, plaintext in zip(rows, plaintexts) if plaintext is not None]
+        new_tokens, _ = new_encryptor.encrypt_many(plaintext for _, plaintext in pending)
+
+        # Sólo se sobrescribe la fila si no ha cambiado desde que se leyó. El token
+        # anterior se compara como String, que no convierte el valor (los tokens
+        # antiguos se guardaron como texto y los nuevos como BLOB)
+        table = Password.__table__
+        statement = update(table).where(
+            table.c.id == bindparam('row_id'),
+            table.c.encrypted_password == bindparam('old_token', type_=db.String())
+        ).values(encrypted_password=bindparam('new_token', type_=table.c.encrypted_password.type))
+        changes = [
+            {'row_id': row.id, 'old_token': row.encrypted_password, 'new_token': token}
+            for (row, _), token in zip(pending, new_tokens) if token is not None
+        ]
+
+        try:
+            # Las filas se confirman antes que el punto de control porque, con
+            # sharding, están en otra base de datos. Si se interrumpe entre ambas,
+            # repetir el bloque es inocuo: sólo se reescriben las filas que aún
+            # conservan el token anterior
+            rotated = db.session.execute(statement, changes).rowcount if changes else 0
+            db.session.commit()
+            self.last_id = rows[-1].id
+            self.rotated += rotated
+            self.failed += len(rows) - len(pending)
+            self.updated_at = datetime.utcnow()
+            db.session.commit()
+            return len(rows)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error rotating passwords: {str(e)}")
+            raise
+
+    def _finish(self, user):
+        """Activa la clave nueva y cierra la rotación"""
+        old_key = user.master_key
+        try:
+            user.master_key = self.new_master_key
+            if self.new_kdf_params is not None:
+                user.kdf_params = self.new_kdf_params
+                user.kdf_salt = self.new_kdf_salt
+            else:
+                user.kdf_params = None
+                user.kdf_salt = None
+            self.status = 'completed'
+            self.new_master_key = None
+            self.new_kdf_salt = None
+            self.completed_at = self.updated_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error finishing key rotation: {str(e)}")
+            raise
+        cipher_cache.invalidate(old_key)
+
+    def run(self, chunk_size=500):
+        """Procesa todos los bloques pendientes hasta completar la rotación"""
+        while self.status == 'running':
+            self.run_chunk(chunk_size)
+        return self
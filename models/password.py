@@ -1,7 +1,65 @@
 from . import db
+from sqlalchemy import select, insert, update, func, and_, or_, bindparam
+from sqlalchemy.orm import load_only
+from urllib.parse import urlparse
+import base64
+import json
 from datetime import datetime
 from utils.encryptor import PasswordEncryptor
+from utils.password_generator import PasswordGenerator
+from .key_rotation import KeyRotation
+from .user import User
+from .tombstone import PasswordTombstone
+from .stats import stats_cache, old_password_cutoff
+from .vault_cache import vault_cache, record_write, row_metadata, get_vault_metadata
 from datetime import timezone
+from itertools import islice
+
+class Ciphertext(db.TypeDecorator):
+    """
+    Columna binaria para los textos cifrados.
+    Las filas antiguas guardan tokens Fernet como texto y se devuelven tal cual;
+    PasswordEncryptor detecta el formato al descifrar.
+    """
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return value.encode()
+        return value
+
+
+def extract_domain(url):
+    """
+    Obtiene el dominio (en minúsculas y sin puerto) de una URL.
+    Acepta URLs sin esquema como 'github.com/login'.
+    """
+    if not url:
+        return ''
+    parsed = urlparse(url if '//' in url else f'//{url}')
+    return (parsed.hostname or '').lower()
+
+
+# Categoría de fortaleza guardada para cada descripción de measure_strength
+STRENGTH_CATEGORIES = {
+    'Débil': 'weak',
+    'Moderada': 'medium',
+    'Fuerte': 'strong',
+    'Muy fuerte': 'strong'
+}
+
+
+def measure_strength(password):
+    """
+    Calcula la puntuación y la categoría de fortaleza de una contraseña.
+    
+    Returns:
+        tuple: (int, str) Puntuación de measure_strength y 'weak', 'medium' o 'strong'
+    """
+    info = PasswordGenerator().measure_strength(password)
+    return info['score'], STRENGTH_CATEGORIES[info['strength']]
+
 
 class Password(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,43 +67,284 @@ class Password(db.Model):
     name = db.Column(db.String(100), nullable=False)
     url = db.Column(db.String(200))
     username = db.Column(db.String(100), nullable=False)
-    encrypted_password = db.Column(db.String(500), nullable=False)
+    encrypted_password = db.Column(Ciphertext, nullable=False)
     comments = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    domain = db.Column(db.String(200))  # Derivado de url al escribir, para filtrar y ordenar en SQL
+    # Calculadas al cifrar, para no descifrar la bóveda al mostrar estadísticas
+    strength_score = db.Column(db.Integer)
+    strength_category = db.Column(db.String(10))
+    # Sincronización incremental: fecha de la última escritura y vault_version del
+    # usuario en ese momento (0 en filas anteriores a la columna)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        # Listado por usuario ordenado por fecha; id desempata para la paginación por cursor
+        db.Index('ix_password_user_created', 'user_id', created_at.desc(), 'id'),
+        db.Index('ix_password_user_name', 'user_id', 'name', 'id'),
+        db.Index('ix_password_user_domain', 'user_id', 'domain', 'id'),
+        db.Index('ix_password_user_version', 'user_id', 'version'),
+    )
+
+    # Campos que puede devolver el listado (?fields=) y columnas por las que se puede ordenar (?sort=)
+    LIST_FIELDS = ('id', 'user_id', 'name', 'url', 'username', 'comments', 'created_at')
+    PROJECTABLE_FIELDS = LIST_FIELDS + ('domain', 'updated_at', 'version')
+    CHANGE_FIELDS = LIST_FIELDS + ('updated_at', 'version')
+    SORTABLE_FIELDS = ('created_at', 'name', 'domain')
+    DEFAULT_SORT = '-created_at'
 
     @staticmethod
     def create(user_id, name, url, username, password, master_key, comments=None):
         """Crea una nueva contraseña"""
         try:
-            encryptor = PasswordEncryptor(master_key.encode())
+            encryption_key, _ = KeyRotation.resolve_keys(user_id, master_key)
+            encryptor = PasswordEncryptor.for_key(encryption_key)
             encrypted_password = encryptor.encrypt(password)
+            strength_score, strength_category = measure_strength(password)
+            version = User.bump_vault_version(user_id)
             
             new_password = Password(
                 user_id=user_id,
                 name=name,
                 url=url,
+                domain=extract_domain(url),
                 username=username,
                 encrypted_password=encrypted_password,
-                comments=comments
+                strength_score=strength_score,
+                strength_category=strength_category,
+                comments=comments,
+                version=version
             )
             
             db.session.add(new_password)
+            db.session.flush()
+            metadata = row_metadata(new_password)
             db.session.commit()
+            stats_cache.invalidate(user_id)
+            record_write(user_id, version, rows=[metadata])
             return new_password
         except Exception as e:
             db.session.rollback()
             print(f"Error creating password: {str(e)}")
             return None
 
+    @staticmethod
+    def create_many(user_id, items, master_key):
+        """
+        Crea varias contraseñas en una única transacción.
+        Las contraseñas se cifran en lote y se insertan con una sola sentencia
+        INSERT de varias filas.
+        
+        Args:
+            user_id (int): ID del usuario
+            items (list): Diccionarios con name, url, username, password y comments
+            master_key (str): Clave maestra del usuario
+            
+        Returns:
+            list: IDs creados en el mismo orden que items, o None si falla
+        """
+        try:
+            encryption_key, _ = KeyRotation.resolve_keys(user_id, master_key)
+            encryptor = PasswordEncryptor.for_key(encryption_key)
+            tokens, errors = encryptor.encrypt_many(item['password'] for item in items)
+            if errors:
+                raise ValueError(f'No se pudieron cifrar {len(errors)} contraseñas')
+            
+            created_at = datetime.utcnow()
+            strengths = [measure_strength(item['password']) for item in items]
+            version = User.bump_vault_version(user_id)
+            rows = [{
+                'user_id': user_id,
+                'name': item['name'],
+                'url': item.get('url', ''),
+                'domain': extract_domain(item.get('url', '')),
+                'username': item['username'],
+                'encrypted_password': token,
+                'strength_score': score,
+                'strength_category': category,
+                'comments': item.get('comments', ''),
+                'created_at': created_at,
+                'updated_at': created_at,
+                'version': version
+            } for item, token, (score, category) in zip(items, tokens, strengths)]
+            
+            ids = db.session.scalars(
+                insert(Password).returning(Password.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+            db.session.commit()
+            stats_cache.invalidate(user_id)
+            record_write(user_id, version, rows=[row_metadata(dict(row, id=password_id)) for row, password_id in zip(rows, ids)])
+            return ids
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error creating passwords: {str(e)}")
+            return None
+
     @staticmethod
     def get(password_id):
         """Obtiene una contraseña por su ID"""
         return Password.query.get(password_id)
 
     @staticmethod
-    def get_all_for_user(user_id):
+    def get_many_for_user(user_id, password_ids):
+        """Obtiene las contraseñas de un usuario cuyos IDs se indican"""
+        if not password_ids:
+            return []
+        return Password.query.filter(
+            Password.user_id == user_id,
+            Password.id.in_(password_ids)
+        ).all()
+
+    @staticmethod
+    def query_for_user(user_id, sort=None, filters=None, fields=None):
+        """
+        Construye la consulta del listado de un usuario con filtros, orden y
+        proyección de columnas resueltos en SQL.
+        
+        Args:
+            user_id (int): ID del usuario
+            sort (str, optional): Columna de SORTABLE_FIELDS, con '-' delante para
+                orden descendente. Por defecto '-created_at'
+            filters (dict, optional): domain, created_before y/o created_after
+            fields (iterable, optional): Columnas a cargar (id siempre se incluye)
+            
+        Raises:
+            ValueError: Si el orden o los campos no son válidos
+        """
+        column, descending = Password._sort_column(sort)
+        query = Password.query.filter(Password.user_id == user_id)
+        
+        filters = filters or {}
+        if filters.get('domain'):
+            domain = filters['domain'].lower()
+            escaped = domain.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(or_(
+                Password.domain == domain,
+                Password.domain.like(f'%.{escaped}', escape='\\')
+            ))
+        if filters.get('created_before'):
+            query = query.filter(Password.created_at < filters['created_before'])
+        if filters.get('created_after'):
+            query = query.filter(Password.created_at >= filters['created_after'])
+        
+        if fields:
+            invalid = set(fields) - set(Password.PROJECTABLE_FIELDS) - {'encrypted_password'}
+            if invalid:
+                raise ValueError(f"Campos no válidos: {', '.join(sorted(invalid))}")
+            columns = {'id', 'user_id', *fields}
+            query = query.options(load_only(*(getattr(Password, name) for name in columns)))
+        
+        return query.order_by(column.desc() if descending else column, Password.id)
+
+    @staticmethod
+    def _sort_column(sort):
+        """Devuelve (columna, descendente) para un parámetro de orden"""
+        sort = sort or Password.DEFAULT_SORT
+        descending = sort.startswith('-')
+        name = sort.lstrip('-')
+        if name not in Password.SORTABLE_FIELDS:
+            raise ValueError(f"Sólo se puede ordenar por {', '.join(Password.SORTABLE_FIELDS)}")
+        return getattr(Password, name), descending
+
+    @staticmethod
+    def get_all_for_user(user_id, sort=None, filters=None, fields=None):
         """Obtiene todas las contraseñas de un usuario"""
-        return Password.query.filter_by(user_id=user_id).order_by(Password.created_at.desc()).all()
+        return Password.query_for_user(user_id, sort, filters, fields).all()
+
+    @staticmethod
+    def encode_cursor(password, sort=None):
+        """Codifica la posición de una contraseña en un orden dado como cursor opaco"""
+        sort = sort or Password.DEFAULT_SORT
+        value = getattr(password, sort.lstrip('-'))
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        raw = json.dumps([sort, value, password.id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, sort=None):
+        """
+        Decodifica un cursor generado por encode_cursor para el mismo orden.
+        
+        Raises:
+            ValueError: Si el cursor no es válido o es de otro orden
+        """
+        sort = sort or Password.DEFAULT_SORT
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            cursor_sort, value, password_id = json.loads(raw)
+            if cursor_sort != sort:
+                raise ValueError
+            if value is not None and sort.lstrip('-') == 'created_at':
+                value = datetime.fromisoformat(value)
+            return value, int(password_id)
+        except Exception:
+            raise ValueError('Cursor no válido')
+
+    @staticmethod
+    def get_page_for_user(user_id, limit, cursor=None, sort=None, filters=None, fields=None):
+        """
+        Obtiene una página de contraseñas usando paginación por cursor (keyset),
+        en el mismo orden que get_all_for_user y apoyada en los índices por usuario.
+        
+        Args:
+            user_id (int): ID del usuario
+            limit (int): Tamaño de la página
+            cursor (str, optional): Cursor devuelto por la página anterior
+            sort, filters, fields: Igual que en query_for_user
+            
+        Returns:
+            tuple: (list, str) Contraseñas de la página y cursor de la siguiente
+            (None si no hay más)
+        """
+        query = Password.query_for_user(user_id, sort, filters, fields)
+        if cursor:
+            column, descending = Password._sort_column(sort)
+            value, password_id = Password.decode_cursor(cursor, sort)
+            # SQLite ordena los NULL como el valor más pequeño: al final en
+            # orden descendente y al principio en ascendente
+            if value is None:
+                tie = and_(column.is_(None), Password.id > password_id)
+                query = query.filter(tie if descending else or_(tie, column.isnot(None)))
+            else:
+                tie = and_(column == value, Password.id > password_id)
+                if descending:
+                    query = query.filter(or_(column < value, tie, column.is_(None)))
+                else:
+                    query = query.filter(or_(column > value, tie))
+        
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            return rows[:limit], Password.encode_cursor(rows[limit - 1], sort)
+        return rows, None
+
+    @staticmethod
+    def backfill_domains(batch_size=500):
+        """Calcula el dominio de las filas creadas antes de existir la columna"""
+        while True:
+            rows = db.session.query(Password.id, Password.user_id, Password.url).filter(
+                Password.domain.is_(None)
+            ).limit(batch_size).all()
+            if not rows:
+                return
+            versions = {user_id: User.bump_vault_version(user_id) for user_id in {row.user_id for row in rows}}
+            db.session.execute(update(Password), [
+                {'id': row.id, 'domain': extract_domain(row.url), 'version': versions[row.user_id]}
+                for row in rows
+            ])
+            db.session.commit()
+            stats_cache.clear()
+            vault_cache.clear()
+
+    @staticmethod
+    def backfill_updated_at():
+        """Inicializa updated_at con created_at en las filas creadas antes de existir la columna"""
+        db.session.execute(
+            update(Password).where(Password.updated_at.is_(None)).values(updated_at=Password.created_at)
+        )
+        db.session.commit()
 
     def update(self, name=None, url=None, username=None, password=None, comments=None, master_key=None):
         """Actualiza los datos de la contraseña"""
@@ -54,50 +353,298 @@ class Password(db.Model):
                 self.name = name
             if url is not None:
                 self.url = url
+                self.domain = extract_domain(url)
             if username is not None:
                 self.username = username
-            if password is not None and master_key is not None:
-                encryptor = PasswordEncryptor(master_key.encode())
-                self.encrypted_password = encryptor.encrypt(password)
-                self.created_at = datetime.now(timezone.utc)  # Actualizar fecha al cambiar contraseña
+            if master_key is not None:
+                encryption_key, decryption_keys = KeyRotation.resolve_keys(self.user_id, master_key)
+                encryptor = PasswordEncryptor.for_key(encryption_key)
+                if password is not None:
+                    self.encrypted_password = encryptor.encrypt(password)
+                    self.strength_score, self.strength_category = measure_strength(password)
+                    self.created_at = datetime.now(timezone.utc)  # Actualizar fecha al cambiar contraseña
+                elif len(decryption_keys) == 1 and encryptor.needs_upgrade(self.encrypted_password):
+                    # Migrar al formato actual los textos cifrados antiguos al reescribir la fila
+                    # (durante una rotación ya se encarga el motor de rotación)
+                    self.encrypted_password = encryptor.upgrade(self.encrypted_password)
             if comments is not None:
                 self.comments = comments
                 
+            self.version = User.bump_vault_version(self.user_id)
+            self.updated_at = datetime.utcnow()
+            user_id, version, metadata = self.user_id, self.version, row_metadata(self)
             db.session.commit()
+            stats_cache.invalidate(user_id)
+            record_write(user_id, version, rows=[metadata])
             return True
         except Exception as e:
             db.session.rollback()
             print(f"Error updating password: {str(e)}")
             return False
 
+    @staticmethod
+    def migrate_legacy_ciphertexts(user_id, master_key, batch_size=500):
+        """
+        Reescribe al formato actual las contraseñas cifradas con el formato anterior.
+        Recorre las filas del usuario por bloques de ID y confirma cada bloque.
+        
+        Returns:
+            int: Número de contraseñas migradas
+        """
+        encryption_key, decryption_keys = KeyRotation.resolve_keys(user_id, master_key)
+        if len(decryption_keys) > 1:
+            # La rotación en curso ya re-cifra todas las filas en el formato actual
+            return 0
+        encryptor = PasswordEncryptor.for_key(encryption_key)
+        migrated = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Password.id, Password.encrypted_password).filter(
+                Password.user_id == user_id,
+                Password.id > last_id
+            ).order_by(Password.id).limit(batch_size).all()
+            if not rows:
+                return migrated
+            last_id = rows[-1].id
+
+            legacy = [row for row in rows if encryptor.needs_upgrade(row.encrypted_password)]
+            if not legacy:
+                continue
+
+            upgraded, errors = encryptor.upgrade_many(row.encrypted_password for row in legacy)
+            for index in errors:
+                print(f"Error migrating password {legacy[index].id}: {str(errors[index])}")
+            # Sólo se reescribe la fila si conserva el token leído (como en
+            # KeyRotation.run_chunk): si el usuario la ha modificado mientras
+            # tanto, Password.update ya la ha guardado en el formato actual
+            table = Password.__table__
+            statement = update(table).where(
+                table.c.id == bindparam('row_id'),
+                table.c.encrypted_password == bindparam('old_token', type_=db.String())
+            ).values(encrypted_password=bindparam('new_token', type_=table.c.encrypted_password.type))
+            changes = [
+                {'row_id': row.id, 'old_token': row.encrypted_password, 'new_token': token}
+                for row, token in zip(legacy, upgraded) if token is not None
+            ]
+            try:
+                matched = db.session.execute(statement, changes).rowcount if changes else 0
+                db.session.commit()
+                migrated += matched
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error migrating passwords: {str(e)}")
+                raise
+
+    @staticmethod
+    def backfill_strength(user_id, master_key, batch_size=500):
+        """
+        Calcula la fortaleza de las contraseñas guardadas antes de existir las
+        columnas. Descifra por bloques y confirma cada bloque.
+        
+        Returns:
+            int: Número de contraseñas actualizadas
+        """
+        updated = 0
+        last_id = 0
+        while True:
+            rows = db.session.query(Password.id, Password.user_id, Password.encrypted_password).filter(
+                Password.user_id == user_id,
+                Password.strength_category.is_(None),
+                Password.id > last_id
+            ).order_by(Password.id).limit(batch_size).all()
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+            
+            # Sólo se actualiza la fila si sigue teniendo el secreto descifrado y
+            # sin fortaleza: si ha cambiado, Password.update ya la ha calculado
+            table = Password.__table__
+            statement = update(table).where(
+                table.c.id == bindparam('row_id'),
+                table.c.encrypted_password == bindparam('old_token', type_=db.String()),
+                table.c.strength_category.is_(None)
+            ).values(
+                strength_score=bindparam('new_score'),
+                strength_category=bindparam('new_category')
+            )
+            changes = []
+            for row, plaintext in zip(rows, Password.decrypt_many(rows, master_key)):
+                if plaintext is None:
+                    continue
+                score, category = measure_strength(plaintext)
+                changes.append({
+                    'row_id': row.id,
+                    'old_token': row.encrypted_password,
+                    'new_score': score,
+                    'new_category': category
+                })
+            try:
+                matched = db.session.execute(statement, changes).rowcount if changes else 0
+                db.session.commit()
+                stats_cache.invalidate(user_id)
+                updated += matched
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error updating password strength: {str(e)}")
+                raise
+
+    @staticmethod
+    def strength_histogram(user_id):
+        """
+        Cuenta las contraseñas de un usuario por categoría de fortaleza con un
+        único GROUP BY, sin descifrar nada.
+        
+        Returns:
+            dict: Recuento por 'weak', 'medium', 'strong' y 'unknown' (sin calcular)
+        """
+        histogram = {'weak': 0, 'medium': 0, 'strong': 0, 'unknown': 0}
+        rows = db.session.query(Password.strength_category, func.count(Password.id)).filter(
+            Password.user_id == user_id
+        ).group_by(Password.strength_category)
+        for category, count in rows:
+            histogram[category if category in histogram else 'unknown'] += count
+        return histogram
+
+    @staticmethod
+    def query_changes_for_user(user_id, since):
+        """
+        Construye la consulta de las contraseñas escritas después de una versión
+        de la bóveda, en orden de versión.
+        """
+        return Password.query.filter(
+            Password.user_id == user_id,
+            Password.version > since
+        ).order_by(Password.version, Password.id)
+
+    @staticmethod
+    def get_old_for_user(user_id):
+        """Obtiene las contraseñas antiguas del usuario (sólo ID, nombre y fecha), de la más antigua a la más reciente"""
+        metadata = get_vault_metadata(user_id)
+        if metadata is not None:
+            cutoff = old_password_cutoff()
+            return sorted(
+                (row for row in metadata.values() if row['created_at'] is not None and row['created_at'] < cutoff),
+                key=lambda row: (row['created_at'], row['id'])
+            )
+        return Password.query.options(
+            load_only(Password.id, Password.name, Password.created_at)
+        ).filter(
+            Password.user_id == user_id,
+            Password.created_at < old_password_cutoff()
+        ).order_by(Password.created_at, Password.id).all()
+
     def delete(self):
         """Elimina la contraseña"""
         try:
+            user_id, password_id = self.user_id, self.id
+            version = User.bump_vault_version(user_id)
+            db.session.add(PasswordTombstone(
+                user_id=user_id,
+                password_id=password_id,
+                version=version
+            ))
             db.session.delete(self)
             db.session.commit()
+            stats_cache.invalidate(user_id)
+            record_write(user_id, version, deleted_ids=[password_id])
             return True
         except Exception as e:
             db.session.rollback()
             print(f"Error deleting password: {str(e)}")
             return False
 
-    def to_dict(self, include_password=False, master_key=None):
-        """Convierte la contraseña a un diccionario"""
-        data = {
-            'id': self.id,
-            'user_id': self.user_id,
-            'name': self.name,
-            'url': self.url,
-            'username': self.username,
-            'comments': self.comments,
-            'created_at': self.created_at
-        }
+    EXPORT_FIELDS = ('id', 'name', 'url', 'username', 'password', 'comments', 'created_at')
+
+    @staticmethod
+    def iter_export_for_user(user_id, master_key, chunk_size=500):
+        """
+        Recorre las contraseñas de un usuario con un cursor del servidor
+        (yield_per) y las descifra bloque a bloque, de modo que la memoria
+        usada no depende del tamaño de la bóveda.
+        
+        Yields:
+            list: Bloques de diccionarios con los campos de EXPORT_FIELDS
+        """
+        statement = select(
+            Password.id, Password.user_id, Password.name, Password.url, Password.username,
+            Password.encrypted_password, Password.comments, Password.created_at
+        ).where(Password.user_id == user_id).order_by(
+            Password.created_at.desc(), Password.id
+        ).execution_options(yield_per=chunk_size)
+        
+        for rows in db.session.execute(statement).partitions():
+            plaintexts = Password.decrypt_many(rows, master_key)
+            yield [{
+                'id': row.id,
+                'name': row.name,
+                'url': row.url,
+                'username': row.username,
+                'password': plaintext,
+                'comments': row.comments,
+                'created_at': row.created_at.isoformat() if row.created_at else None
+            } for row, plaintext in zip(rows, plaintexts)]
+
+    @staticmethod
+    def decrypt_many(passwords, master_key):
+        """
+        Desencripta en lote las contraseñas indicadas.
+        
+        Returns:
+            list: Contraseñas en claro en el mismo orden (None si falla alguna)
+        """
+        if not passwords:
+            return []
+        
+        # Durante una rotación de clave cada fila puede estar cifrada con la clave
+        # nueva o con la anterior: los fallos se reintentan con la siguiente clave
+        _, decryption_keys = KeyRotation.resolve_keys(passwords[0].user_id, master_key)
+        plaintexts = [None] * len(passwords)
+        pending = list(range(len(passwords)))
+        for key in decryption_keys:
+            results, errors = PasswordEncryptor.for_key(key).decrypt_many(
+                passwords[i].encrypted_password for i in pending
+            )
+            for position, index in enumerate(pending):
+                plaintexts[index] = results[position]
+            pending = [pending[position] for position in errors]
+            if not pending:
+                break
+        
+        for index in pending:
+            print(f"Error decrypting password {passwords[index].id}")
+        return plaintexts
+
+    @staticmethod
+    def to_dicts(passwords, include_password=False, master_key=None, fields=None):
+        """Convierte una lista de contraseñas a diccionarios, desencriptando en lote"""
+        data = [p.to_dict(fields=fields) for p in passwords]
+        if include_password and master_key:
+            for item, plaintext in zip(data, Password.decrypt_many(passwords, master_key)):
+                item['password'] = plaintext
+        return data
+
+    @staticmethod
+    def iter_dicts(query, include_password=False, master_key=None, fields=None, chunk_size=500):
+        """
+        Recorre una consulta con un cursor del servidor (yield_per) y convierte
+        las filas a diccionarios bloque a bloque, descifrando cada bloque en lote.
+        Sólo hay chunk_size filas en memoria a la vez.
+        
+        Yields:
+            dict: Una contraseña por elemento
+        """
+        rows = iter(query.yield_per(chunk_size))
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield from Password.to_dicts(chunk, include_password=include_password, master_key=master_key, fields=fields)
+
+    def to_dict(self, include_password=False, master_key=None, fields=None):
+        """Convierte la contraseña a un diccionario (sólo con fields, si se indican)"""
+        data = {field: getattr(self, field) for field in (fields or Password.LIST_FIELDS)}
         
         if include_password and master_key:
-            try:
-                decryptor = PasswordEncryptor(master_key.encode())
-                data['password'] = decryptor.decrypt(self.encrypted_password)
-            except Exception:
-                data['password'] = None
+            data['password'] = Password.decrypt_many([self], master_key)[0]
                 
         return data
\ No newline at end of file
@@ -0,0 +1,139 @@
+import re
+from flask import current_app
+from sqlalchemy import text, or_
+from sqlalchemy.exc import OperationalError
+from . import db
+
+# Índice FTS5 de contenido externo sobre los metadatos de la tabla password.
+# Los triggers lo mantienen sincronizado con cualquier escritura (ORM, inserciones
+# en bloque o actualizaciones directas), así que no hace falta tocar los modelos.
+# user_id (UNINDEXED) permite filtrar por usuario dentro de la propia consulta FTS.
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS password_fts USING fts5(
+        name, url, username, comments, user_id UNINDEXED,
+        content='password', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS password_fts_insert AFTER INSERT ON password BEGIN
+        INSERT INTO password_fts(rowid, name, url, username, comments, user_id)
+        VALUES (new.id, new.name, new.url, new.username, new.comments, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS password_fts_delete AFTER DELETE ON password BEGIN
+        INSERT INTO password_fts(password_fts, rowid, name, url, username, comments, user_id)
+        VALUES ('delete', old.id, old.name, old.url, old.username, old.comments, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS password_fts_update AFTER UPDATE OF name, url, username, comments, user_id ON password BEGIN
+        INSERT INTO password_fts(password_fts, rowid, name, url, username, comments, user_id)
+        VALUES ('delete', old.id, old.name, old.url, old.username, old.comments, old.user_id);
+        INSERT INTO password_fts(rowid, name, url, username, comments, user_id)
+        VALUES (new.id, new.name, new.url, new.username, new.comments, new.user_id);
+    END
+    """
+]
+
+# Índice anterior, sin la columna user_id: se elimina y se vuelve a crear
+SEARCH_INDEX_DROP = [
+    'DROP TRIGGER IF EXISTS password_fts_insert',
+    'DROP TRIGGER IF EXISTS password_fts_delete',
+    'DROP TRIGGER IF EXISTS password_fts_update',
+    'DROP TABLE IF EXISTS password_fts'
+]
+
+# Pesos de bm25 por columna: name, url, username, comments
+SEARCH_RANK = 'bm25(password_fts, 10.0, 5.0, 5.0, 1.0)'
+
+search_settings = {
+    'fts_available': False
+}
+
+
+def init_search_index(engine=None):
+    """
+    Crea el índice FTS5 y sus triggers si no existen, y lo reconstruye a partir
+    de las filas actuales cuando se crea por primera vez.
+    Si SQLite no incluye FTS5 la búsqueda recurre a LIKE.
+    Por defecto lo crea en la base de datos central (engine: la de un shard).
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != 'sqlite':
+        search_settings['fts_available'] = False
+        return
+    try:
+        with engine.begin() as connection:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'password_fts'"
+            ).first() is not None
+            if exists:
+                columns = [row[1] for row in connection.exec_driver_sql('PRAGMA table_info(password_fts)')]
+                if 'user_id' not in columns:
+                    for ddl in SEARCH_INDEX_DROP:
+                        connection.exec_driver_sql(ddl)
+                    exists = False
+            for ddl in SEARCH_INDEX_DDL:
+                connection.exec_driver_sql(ddl)
+            if not exists:
+                connection.exec_driver_sql("INSERT INTO password_fts(password_fts) VALUES ('rebuild')")
+                current_app.logger.info('Índice de búsqueda password_fts creado')
+        search_settings['fts_available'] = True
+    except OperationalError as e:
+        search_settings['fts_available'] = False
+        current_app.logger.warning(f'FTS5 no disponible, la búsqueda usará LIKE: {e}')
+
+
+def build_match_query(query):
+    """
+    Convierte el texto del usuario en una consulta MATCH de FTS5: cada palabra
+    se busca como prefijo y todas deben aparecer.
+
+    Returns:
+        str: Consulta MATCH, o cadena vacía si no hay palabras
+    """
+    terms = re.findall(r'\w+', query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_password_ids(user_id, query, limit, offset=0):
+    """
+    Busca contraseñas del usuario por nombre, URL, usuario o comentarios.
+
+    Returns:
+        list: IDs ordenados por relevancia (como mucho limit elementos)
+    """
+    from .password import Password
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if search_settings['fts_available']:
+        statement = text(f"""
+            SELECT rowid FROM password_fts
+            WHERE password_fts MATCH :match AND user_id = :user_id
+            ORDER BY {SEARCH_RANK}, rowid
+            LIMIT :limit OFFSET :offset
+        """)
+        params = {'match': match, 'user_id': user_id, 'limit': limit, 'offset': offset}
+        # El texto SQL no indica la tabla: el mapper elige el motor (shard del usuario)
+        return list(db.session.execute(statement, params, bind_arguments={'mapper': Password}).scalars())
+
+    # Alternativa sin FTS5: cada palabra debe aparecer en alguna columna
+    filters = []
+    for term in re.findall(r'\w+', query):
+        pattern = f'%{term}%'
+        filters.append(or_(
+            Password.name.ilike(pattern),
+            Password.url.ilike(pattern),
+            Password.username.ilike(pattern),
+            Password.comments.ilike(pattern)
+        ))
+    rows = db.session.query(Password.id).filter(Password.user_id == user_id, *filters).order_by(
+        Password.name, Password.id
+    ).limit(limit).offset(offset)
+    return [row.id for row in rows]
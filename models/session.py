@@ -0,0 +1,66 @@
+from . import db
+from sqlalchemy import select, insert, delete, func
+
+class SessionRecord(db.Model):
+    """
+    Sesión guardada en el servidor (backend 'sqlite' de utils/server_session.py).
+    La cookie sólo lleva el ID opaco; los datos de la sesión viven aquí.
+
+    Se accede con conexiones propias del motor y no con db.session, para no
+    abrir ni confirmar la transacción de la petición al cargar o guardar la sesión.
+    """
+    sid = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @staticmethod
+    def load(sid, now):
+        """
+        Obtiene los datos serializados de una sesión que no haya caducado.
+
+        Returns:
+            tuple: (str, datetime) Datos y caducidad, o None si no existe
+        """
+        table = SessionRecord.__table__
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(table.c.data, table.c.expires_at).where(
+                    table.c.sid == sid,
+                    table.c.expires_at > now
+                )
+            ).first()
+        return (row.data, row.expires_at) if row is not None else None
+
+    @staticmethod
+    def save(sid, data, expires_at):
+        """Crea o reemplaza una sesión"""
+        table = SessionRecord.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.sid == sid))
+            connection.execute(insert(table).values(sid=sid, data=data, expires_at=expires_at))
+
+    @staticmethod
+    def delete(sid):
+        """Elimina una sesión"""
+        table = SessionRecord.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.sid == sid))
+
+    @staticmethod
+    def sweep(now):
+        """
+        Elimina las sesiones caducadas.
+
+        Returns:
+            int: Número de sesiones eliminadas
+        """
+        table = SessionRecord.__table__
+        with db.engine.begin() as connection:
+            return connection.execute(delete(table).where(table.c.expires_at <= now)).rowcount
+
+    @staticmethod
+    def count():
+        """Número de sesiones guardadas"""
+        table = SessionRecord.__table__
+        with db.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(table)).scalar()
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import has_request_context
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.util import find_tables
+import os
+
+# Tablas con datos de la bóveda que, con SHARD_COUNT > 0, viven en el fichero
+# del shard de cada usuario. El resto (user, key_rotation, session_record...)
+# sigue en la base de datos central.
+SHARDED_TABLES = ('password', 'password_tombstone', 'vault_version')
+
+shard_settings = {
+    'count': 0
+}
+
+_current_shard = ContextVar('current_shard', default=None)
+
+
+def shard_bind_key(index):
+    """Clave de SQLALCHEMY_BINDS del shard"""
+    return f'shard{index}'
+
+
+def shard_for_user(user_id):
+    """Índice del shard donde se guardan las contraseñas de un usuario"""
+    return int(user_id) % shard_settings['count']
+
+
+def shard_indexes():
+    """Índices de los shards (un único None si el sharding está desactivado)"""
+    if not shard_settings['count']:
+        return [None]
+    return list(range(shard_settings['count']))
+
+
+def configure_shards(app):
+    """
+    Añade a SQLALCHEMY_BINDS un fichero SQLite por shard, en SHARD_DIRECTORY o
+    junto a la base de datos central. Debe llamarse antes de db.init_app.
+    """
+    count = app.config.get('SHARD_COUNT', 0)
+    shard_settings['count'] = count
+    if not count:
+        return
+    database = make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+    if not database or database == ':memory:':
+        database = app.config['DATABASE_PATH']
+    directory = app.config.get('SHARD_DIRECTORY') or os.path.dirname(os.path.abspath(database))
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for index in range(count):
+        path = os.path.join(directory, app.config.get('SHARD_FILENAME', 'passwords_shard{index}.db').format(index=index))
+        binds[shard_bind_key(index)] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def current_shard():
+    """
+    Shard de la operación en curso: el fijado con use_shard/use_user_shard o,
+    dentro de una petición, el del usuario autenticado.
+    """
+    index = _current_shard.get()
+    if index is not None:
+        return index
+    if has_request_context() and current_user.is_authenticated:
+        return shard_for_user(current_user.id)
+    raise RuntimeError('Acceso a datos de la bóveda sin shard seleccionado (usa use_user_shard)')
+
+
+@contextmanager
+def use_shard(index):
+    """Dirige las consultas de la bóveda al shard indicado (None: sin cambios)"""
+    token = _current_shard.set(index)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def use_user_shard(user_id):
+    """Dirige las consultas de la bóveda al shard del usuario"""
+    return use_shard(shard_for_user(user_id) if shard_settings['count'] else None)
+
+
+def _targets_sharded_table(mapper, clause):
+    if mapper is not None:
+        return sa_inspect(mapper).local_table.name in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(table, 'name', None) in SHARDED_TABLES for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardedSession(Session):
+    """
+    Sesión de Flask-SQLAlchemy que envía las consultas sobre las tablas de
+    SHARDED_TABLES al motor del shard actual.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and shard_settings['count'] and _targets_sharded_table(mapper, clause):
+            return self._db.engines[shard_bind_key(current_shard())]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
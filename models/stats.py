@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, case
+from . import db
+from utils.ttl_cache import TTLCache
+
+# Días a partir de los cuales una contraseña se considera antigua
+stats_settings = {
+    'old_days': 90
+}
+
+# Estadísticas por usuario. Las escrituras sobre Password invalidan la entrada del
+# usuario; el TTL sólo cubre las contraseñas que pasan a ser antiguas con el tiempo
+stats_cache = TTLCache(maxsize=1024, ttl=300)
+
+
+def init_stats(app):
+    """Configura la caché de estadísticas a partir de la configuración de Flask"""
+    stats_settings['old_days'] = app.config.get('STATS_OLD_DAYS', stats_settings['old_days'])
+    stats_cache.configure(
+        maxsize=app.config.get('STATS_CACHE_SIZE', 1024),
+        ttl=app.config.get('STATS_CACHE_TTL', 300)
+    )
+
+
+def old_password_cutoff():
+    """Fecha (UTC, sin zona) antes de la cual una contraseña es antigua"""
+    return datetime.utcnow() - timedelta(days=stats_settings['old_days'])
+
+
+def compute_user_stats(user_id):
+    """
+    Calcula las estadísticas del perfil con consultas agregadas, sin cargar ni
+    descifrar las filas.
+
+    Returns:
+        dict: total, unique_domains, last_update, old_passwords y strength
+    """
+    from .password import Password
+
+    cutoff = old_password_cutoff()
+    totals = db.session.query(
+        func.count(Password.id),
+        func.count(func.distinct(func.nullif(Password.domain, ''))),
+        func.max(Password.created_at),
+        func.coalesce(func.sum(case((Password.created_at < cutoff, 1), else_=0)), 0)
+    ).filter(Password.user_id == user_id).one()
+
+    return {
+        'total': totals[0],
+        'unique_domains': totals[1],
+        'last_update': totals[2],
+        'old_passwords': totals[3],
+        'old_days': stats_settings['old_days'],
+        'strength': Password.strength_histogram(user_id)
+    }
+
+
+def get_user_stats(user_id):
+    """Obtiene las estadísticas del usuario desde la caché o calculándolas"""
+    return stats_cache.get(user_id, compute_user_stats)
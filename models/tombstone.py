@@ -0,0 +1,33 @@
+from . import db
+from datetime import datetime
+
+class PasswordTombstone(db.Model):
+    """
+    Registro de una contraseña eliminada, para que los clientes que sincronizan
+    por versión (GET /api/passwords/changes) sepan qué filas deben borrar.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    password_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)  # vault_version del usuario al eliminarla
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_password_tombstone_user_version', 'user_id', 'version'),
+    )
+
+    @staticmethod
+    def get_since(user_id, since):
+        """Obtiene las eliminaciones del usuario posteriores a una versión"""
+        return PasswordTombstone.query.filter(
+            PasswordTombstone.user_id == user_id,
+            PasswordTombstone.version > since
+        ).order_by(PasswordTombstone.version, PasswordTombstone.id).all()
+
+    def to_dict(self):
+        """Convierte la eliminación a un diccionario"""
+        return {
+            'id': self.password_id,
+            'version': self.version,
+            'deleted_at': self.deleted_at
+        }
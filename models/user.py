@@ -1,14 +1,20 @@
 from . import db
+from .vault import VaultVersion
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 from utils.encryptor import PasswordEncryptor
+from utils.kdf_executor import kdf_executor, derive_user_secrets
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     master_key = db.Column(db.String(500), nullable=False)
+    # Parámetros con los que se derivó master_key (nulos en cuentas antiguas:
+    # PBKDF2-SHA256 con 100.000 iteraciones y salt de 16 bytes no guardado)
+    kdf_params = db.Column(db.JSON)
+    kdf_salt = db.Column(db.LargeBinary)
     
     # Relación con las contraseñas
     passwords = db.relationship('Password', backref='owner', lazy=True)
@@ -16,16 +22,18 @@ class User(UserMixin, db.Model):
     @staticmethod
     def create(username, password):
         """Crea un nuevo usuario"""
-        # Generar clave maestra para encriptación
-        encryptor = PasswordEncryptor()
-        master_key, salt = PasswordEncryptor.generate_key_from_master(password)
+        # Generar clave maestra y hash en el pool de KDF (puede lanzar KDFSaturatedError)
+        kdf_params = PasswordEncryptor.default_kdf_params()
+        master_key, salt, password_hash = kdf_executor.run(derive_user_secrets, password, kdf_params)
         
         try:
             user = User(
                 username=username,
-                master_key=master_key.decode()
+                password_hash=password_hash,
+                master_key=master_key.decode(),
+                kdf_params=kdf_params,
+                kdf_salt=salt
             )
-            user.set_password(password)
             
             db.session.add(user)
             db.session.commit()
@@ -37,17 +45,33 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Establece la contraseña del usuario"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = kdf_executor.run(generate_password_hash, password)
 
     def check_password(self, password):
         """Verifica la contraseña del usuario"""
-        return check_password_hash(self.password_hash, password)
+        return kdf_executor.run(check_password_hash, self.password_hash, password)
 
     @staticmethod
     def get(user_id):
         """Obtiene un usuario por su ID"""
         return User.query.get(int(user_id))
 
+    @staticmethod
+    def get_vault_version(user_id):
+        """Obtiene la versión de la bóveda del usuario (una lectura por clave primaria)"""
+        return VaultVersion.get(user_id)
+
+    @staticmethod
+    def bump_vault_version(user_id):
+        """
+        Incrementa la versión de la bóveda del usuario dentro de la transacción
+        en curso, para que se confirme (o se deshaga) junto con la escritura.
+        
+        Returns:
+            int: Nueva versión, que se guarda en las filas escritas
+        """
+        return VaultVersion.bump(user_id)
+
     @staticmethod
     def get_by_username(username):
         """Obtiene un usuario por su nombre de usuario"""
@@ -56,7 +80,7 @@ class User(UserMixin, db.Model):
     def get_passwords(self):
         """Obtiene todas las contraseñas del usuario"""
         # Desencriptar las contraseñas
-        encryptor = PasswordEncryptor(self.master_key.encode())
+        encryptor = PasswordEncryptor.for_key(self.master_key)
         return [{
             'id': pw.id,
             'name': pw.name,
@@ -69,7 +93,7 @@ class User(UserMixin, db.Model):
     def add_password(self, name, url, username, password):
         """Añade una nueva contraseña para el usuario"""
         # Encriptar la contraseña
-        encryptor = PasswordEncryptor(self.master_key.encode())
+        encryptor = PasswordEncryptor.for_key(self.master_key)
         encrypted_password = encryptor.encrypt(password)
         
         try:
@@ -101,7 +125,7 @@ class User(UserMixin, db.Model):
         if username is not None:
             pw.username = username
         if password is not None:
-            encryptor = PasswordEncryptor(self.master_key.encode())
+            encryptor = PasswordEncryptor.for_key(self.master_key)
             pw.password = encryptor.encrypt(password)
             
         try:
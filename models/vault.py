@@ -0,0 +1,55 @@
+from . import db
+from sqlalchemy import inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class VaultVersion(db.Model):
+    """
+    Versión de la bóveda de cada usuario: se incrementa con cada escritura y
+    sirve para los ETag y la sincronización incremental del API.
+
+    Vive junto a las contraseñas (en el shard del usuario si hay sharding), de
+    modo que el incremento y la escritura comparten transacción sin bloquear
+    la tabla de usuarios.
+    """
+    __tablename__ = 'vault_version'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def get(user_id):
+        """Obtiene la versión de la bóveda (0 si el usuario nunca ha escrito)"""
+        return db.session.query(VaultVersion.version).filter_by(user_id=user_id).scalar() or 0
+
+    @staticmethod
+    def bump(user_id):
+        """
+        Incrementa la versión dentro de la transacción en curso (la crea si no
+        existe).
+
+        Returns:
+            int: Nueva versión
+        """
+        statement = sqlite_insert(VaultVersion).values(user_id=user_id, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[VaultVersion.user_id],
+            set_={'version': VaultVersion.version + 1}
+        ).returning(VaultVersion.version)
+        return db.session.execute(statement).scalar()
+
+    @staticmethod
+    def import_legacy_versions():
+        """
+        Copia a esta tabla las versiones guardadas en la antigua columna
+        user.vault_version y la pone a 0, para que no se vuelvan a copiar.
+        """
+        inspector = inspect(db.engine)
+        if 'vault_version' not in {column['name'] for column in inspector.get_columns('user')}:
+            return 0
+        with db.engine.begin() as connection:
+            copied = connection.exec_driver_sql(
+                'INSERT OR IGNORE INTO vault_version (user_id, version) '
+                'SELECT id, vault_version FROM "user" WHERE vault_version > 0'
+            ).rowcount
+            connection.exec_driver_sql('UPDATE "user" SET vault_version = 0 WHERE vault_version > 0')
+        return copied
@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+from . import db
+from .stats import get_user_stats
+from utils.versioned_cache import VersionedLRUCache, estimate_size
+
+vault_cache_settings = {
+    'max_rows': 5000  # Bóvedas con más filas se leen siempre de la base de datos
+}
+
+# Metadatos de la bóveda de cada usuario (Password.PROJECTABLE_FIELDS: nunca las
+# contraseñas ni los textos cifrados), por ID de contraseña. Cada entrada lleva
+# la versión de la bóveda con la que se leyó y las escrituras de Password la
+# actualizan en el momento (write-through)
+vault_cache = VersionedLRUCache(max_bytes=64 * 1024 * 1024)
+
+
+def init_vault_cache(app):
+    """Configura la caché de metadatos a partir de la configuración de Flask"""
+    vault_cache_settings['max_rows'] = app.config.get('VAULT_CACHE_MAX_ROWS', vault_cache_settings['max_rows'])
+    vault_cache.configure(max_bytes=app.config.get('VAULT_CACHE_MAX_BYTES', vault_cache.max_bytes))
+    vault_cache.clear()
+
+
+def _normalize(value):
+    # Las fechas se guardan en UTC sin zona: las que llevan zona se pasan a UTC
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def row_metadata(row):
+    """Metadatos cacheables de una contraseña (objeto, fila o diccionario)"""
+    from .password import Password
+    get = row.get if isinstance(row, dict) else lambda field: getattr(row, field)
+    return {field: _normalize(get(field)) for field in Password.PROJECTABLE_FIELDS}
+
+
+def _row_size(password_id, row):
+    return estimate_size(password_id) + estimate_size(row)
+
+
+def _load(user_id):
+    from .password import Password
+    # El total sale de la caché de estadísticas y evita cargar bóvedas enormes
+    if vault_cache_settings['max_rows'] and get_user_stats(user_id)['total'] > vault_cache_settings['max_rows']:
+        return None
+    columns = [getattr(Password, field) for field in Password.PROJECTABLE_FIELDS]
+    rows = db.session.query(*columns).filter(Password.user_id == user_id)
+    return {row.id: row_metadata(row) for row in rows}
+
+
+def get_vault_metadata(user_id):
+    """
+    Obtiene los metadatos de las contraseñas del usuario desde la caché o la
+    base de datos. Lee primero la versión de la bóveda, de modo que una entrada
+    cacheada antes de la última escritura nunca se devuelve.
+
+    Returns:
+        dict: Metadatos por ID (compartidos: no deben modificarse), o None si la
+              caché está desactivada o la bóveda supera VAULT_CACHE_MAX_ROWS
+    """
+    if not vault_cache.enabled:
+        return None
+    from .user import User
+    return vault_cache.get(user_id, User.get_vault_version(user_id), _load)
+
+
+def record_write(user_id, version, rows=(), deleted_ids=()):
+    """
+    Aplica a la entrada cacheada del usuario una escritura ya confirmada que
+    dejó la bóveda en version: rows son los metadatos de las filas creadas o
+    modificadas y deleted_ids los IDs eliminados.
+    """
+    if not vault_cache.enabled:
+        return
+    changes = {row['id']: row for row in rows}
+
+    def mutate(current):
+        value = dict(current)
+        delta = 0
+        for password_id in deleted_ids:
+            old = value.pop(password_id, None)
+            if old is not None:
+                delta -= _row_size(password_id, old)
+        for password_id, row in changes.items():
+            old = value.get(password_id)
+            delta += _row_size(password_id, row) - (_row_size(password_id, old) if old is not None else 0)
+            value[password_id] = row
+        return value, delta
+
+    vault_cache.update(user_id, version - 1, version, mutate)
+
+
+def _sort_key(field):
+    # SQLite ordena los NULL como el valor más pequeño
+    return lambda row: (row[field] is not None, row[field])
+
+
+def list_vault_metadata(user_id, sort=None, filters=None, fields=None):
+    """
+    Listado de metadatos del usuario servido desde la caché, con los mismos
+    filtros, orden y proyección que Password.query_for_user.
+
+    Returns:
+        list: Diccionarios con fields (o LIST_FIELDS), o None si no hay caché
+
+    Raises:
+        ValueError: Si el orden no es válido
+    """
+    from .password import Password
+    sort = sort or Password.DEFAULT_SORT
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in Password.SORTABLE_FIELDS:
+        raise ValueError(f"Sólo se puede ordenar por {', '.join(Password.SORTABLE_FIELDS)}")
+
+    metadata = get_vault_metadata(user_id)
+    if metadata is None:
+        return None
+
+    rows = list(metadata.values())
+    filters = filters or {}
+    if filters.get('domain'):
+        domain = filters['domain'].lower()
+        rows = [row for row in rows if row['domain'] and (row['domain'] == domain or row['domain'].endswith(f'.{domain}'))]
+    for filter_name, keep in (('created_before', lambda value, limit: value < limit),
+                              ('created_after', lambda value, limit: value >= limit)):
+        if filters.get(filter_name):
+            limit = _normalize(filters[filter_name])
+            rows = [row for row in rows if row['created_at'] is not None and keep(row['created_at'], limit)]
+
+    # Orden estable: primero por ID y después por la columna pedida
+    rows.sort(key=lambda row: row['id'])
+    rows.sort(key=_sort_key(name), reverse=descending)
+
+    fields = fields or Password.LIST_FIELDS
+    return [{field: row[field] for field in fields} for row in rows]
@@ -1,17 +1,227 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app, Response, stream_with_context, make_response
 from flask_login import login_required, current_user
 from models.password import Password
+from models.user import User
+from models.tombstone import PasswordTombstone
+from models.search import search_password_ids
+from models.stats import get_user_stats, stats_cache
+from models.vault_cache import vault_cache, get_vault_metadata, list_vault_metadata
+from models.activity import activity_writer, log_activity, recent_activity
+from models.identity import identity_cache
 from utils.password_generator import PasswordGenerator
+from utils.encryptor import cipher_cache
+from utils.kdf_executor import kdf_executor
+from utils.json_stream import stream_json_array, stream_json_object
+from utils.compression import compression_stats
+from datetime import datetime, timezone
+import csv
+import hashlib
+import io
+import json
 
 api = Blueprint('api', __name__)
 
+def parse_listing_args(args):
+    """
+    Interpreta los parámetros de proyección, orden y filtros del listado.
+    
+    Returns:
+        tuple: (fields, sort, filters)
+        
+    Raises:
+        ValueError: Si algún parámetro no es válido
+    """
+    fields = None
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        invalid = [field for field in fields if field not in Password.PROJECTABLE_FIELDS]
+        if invalid:
+            raise ValueError(f"Campos no válidos: {', '.join(invalid)}")
+        if 'id' not in fields:
+            fields.insert(0, 'id')
+    
+    filters = {}
+    if args.get('domain'):
+        filters['domain'] = args['domain'].strip()
+    for name in ('created_before', 'created_after'):
+        if args.get(name):
+            try:
+                value = datetime.fromisoformat(args[name])
+            except ValueError:
+                raise ValueError(f'{name} debe ser una fecha ISO 8601')
+            # Las fechas se guardan en UTC sin zona: convertir las que indican desfase
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc).replace(tzinfo=None)
+            filters[name] = value
+    
+    return fields, args.get('sort') or None, filters
+
+def vault_etag(user_id):
+    """
+    Calcula el ETag de una respuesta de lectura a partir de la versión de la
+    bóveda del usuario y de la URL pedida (ruta y parámetros).
+    Sólo hace una lectura por clave primaria, sin tocar la tabla de contraseñas.
+    """
+    version = User.get_vault_version(user_id)
+    variant = '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+    return hashlib.sha256(f'{user_id}:{version}:{request.path}?{variant}'.encode()).hexdigest()[:32]
+
+def conditional_response(etag, build, include_password=False):
+    """
+    Devuelve 304 si el cliente ya tiene la versión actual (If-None-Match) y,
+    si no, construye la respuesta con build() y le añade el ETag.
+    Las respuestas con contraseñas descifradas no se guardan en la caché del navegador.
+    """
+    cache_control = 'private, no-store' if include_password else 'private, no-cache'
+    # If-None-Match usa comparación débil: la versión comprimida lleva W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @api.route('/passwords', methods=['GET'])
 @login_required
 def get_passwords():
-    """Endpoint para obtener todas las contraseñas del usuario"""
+    """
+    Endpoint para obtener todas las contraseñas del usuario.
+    Por defecto sólo devuelve metadatos; las contraseñas se revelan bajo demanda
+    con /passwords/<id>/secret o /passwords/reveal (o con ?include_password=true).
+    Admite ?fields= (proyección), ?sort= (created_at, name o domain, con '-' para
+    descendente) y los filtros ?domain=, ?created_before= y ?created_after=.
+    Con ?limit= y/o ?cursor= devuelve una página y el cursor de la siguiente.
+    """
     try:
-        passwords = Password.get_all_for_user(current_user.id)
-        return jsonify([p.to_dict(include_password=True, master_key=current_user.master_key) for p in passwords])
+        include_password = request.args.get('include_password', '').lower() in ('1', 'true', 'yes')
+        master_key = session.get('master_key')
+        if include_password and not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+        try:
+            fields, sort, filters = parse_listing_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Para descifrar hace falta cargar también el texto cifrado
+        load_fields = fields + ['encrypted_password'] if fields and include_password else fields
+        paginated = 'limit' in request.args or 'cursor' in request.args
+        
+        if paginated:
+            try:
+                limit = int(request.args.get('limit', current_app.config.get('PAGE_SIZE_DEFAULT', 100)))
+            except ValueError:
+                return jsonify({'error': 'El límite debe ser un número'}), 400
+            max_limit = current_app.config.get('PAGE_SIZE_MAX', 500)
+            if not (1 <= limit <= max_limit):
+                return jsonify({'error': f'El límite debe estar entre 1 y {max_limit}'}), 400
+        
+        def build():
+            if not paginated:
+                # Sin contraseñas descifradas, los metadatos salen de la caché de la bóveda
+                try:
+                    cached = None if include_password else list_vault_metadata(current_user.id, sort, filters, fields)
+                except ValueError as e:
+                    return make_response(jsonify({'error': str(e)}), 400)
+                if cached is not None:
+                    return stream_json_array(cached)
+                
+                # Listado completo: se codifica fila a fila desde el cursor de la
+                # consulta, sin construir la lista entera en memoria
+                try:
+                    query = Password.query_for_user(current_user.id, sort, filters, load_fields)
+                except ValueError as e:
+                    return make_response(jsonify({'error': str(e)}), 400)
+                return stream_json_array(Password.iter_dicts(
+                    query,
+                    include_password=include_password,
+                    master_key=master_key,
+                    fields=fields,
+                    chunk_size=current_app.config.get('LISTING_CHUNK_SIZE', 500)
+                ))
+            
+            try:
+                passwords, next_cursor = Password.get_page_for_user(
+                    current_user.id, limit, request.args.get('cursor') or None, sort, filters, load_fields
+                )
+            except ValueError as e:
+                return make_response(jsonify({'error': str(e)}), 400)
+            
+            return jsonify({
+                'passwords': Password.to_dicts(
+                    passwords,
+                    include_password=include_password,
+                    master_key=master_key,
+                    fields=fields
+                ),
+                'next_cursor': next_cursor
+            })
+        
+        # Si la bóveda no ha cambiado se responde 304 sin leer ni descifrar filas
+        response = conditional_response(vault_etag(current_user.id), build, include_password)
+        if response.status_code == 200:
+            log_activity('reveal' if include_password else 'list')
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/passwords/<int:password_id>/secret', methods=['GET'])
+@login_required
+def get_password_secret(password_id):
+    """Endpoint para revelar la contraseña descifrada de una entrada"""
+    try:
+        password = Password.get(password_id)
+        if not password or password.user_id != current_user.id:
+            return jsonify({'error': 'Contraseña no encontrada'}), 404
+
+        master_key = session.get('master_key')
+        if not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+
+        plaintext = Password.decrypt_many([password], master_key)[0]
+        if plaintext is None:
+            return jsonify({'error': 'No se pudo descifrar la contraseña'}), 500
+
+        log_activity('reveal', password)
+        return jsonify({'id': password.id, 'password': plaintext})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/passwords/reveal', methods=['POST'])
+@login_required
+def reveal_passwords():
+    """Endpoint para revelar en lote las contraseñas de una lista de IDs"""
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('ids'), list):
+            return jsonify({'error': 'Se requiere una lista de IDs'}), 400
+
+        try:
+            password_ids = list(dict.fromkeys(int(i) for i in data['ids']))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Los IDs deben ser números'}), 400
+
+        max_ids = current_app.config.get('REVEAL_MAX_IDS', 100)
+        if len(password_ids) > max_ids:
+            return jsonify({'error': f'No se pueden revelar más de {max_ids} contraseñas a la vez'}), 400
+
+        master_key = session.get('master_key')
+        if not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+
+        passwords = Password.get_many_for_user(current_user.id, password_ids)
+        plaintexts = Password.decrypt_many(passwords, master_key)
+        found = {p.id: plaintext for p, plaintext in zip(passwords, plaintexts)}
+        for password in passwords:
+            log_activity('reveal', password)
+
+        return jsonify({
+            'passwords': [
+                {'id': pid, 'password': found[pid]} for pid in password_ids if pid in found
+            ],
+            'not_found': [pid for pid in password_ids if pid not in found]
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -47,24 +257,252 @@ def create_password():
         if password is None:
             return jsonify({'error': 'Error al crear la contraseña en la base de datos'}), 500
 
+        log_activity('create', password)
         return jsonify(password.to_dict(include_password=True, master_key=master_key)), 201
     except Exception as e:
         print(f"Error al crear contraseña: {str(e)}")  # Para debugging
         return jsonify({'error': f'Error al crear la contraseña: {str(e)}'}), 500
 
+def validate_bulk_item(item):
+    """
+    Valida un elemento de POST /api/passwords/bulk antes de cifrar nada:
+    tipos de los campos y longitud máxima de las columnas.
+
+    Returns:
+        str: Mensaje de error, o None si el elemento es válido
+    """
+    if not isinstance(item, dict):
+        return 'Formato no válido'
+    for field in ('name', 'username', 'password'):
+        if not item.get(field):
+            return f'El campo {field} es requerido'
+        if not isinstance(item[field], str):
+            return f'El campo {field} debe ser texto'
+    # null equivale a no enviar el campo, como en POST /api/passwords
+    for field in ('url', 'comments'):
+        if item.get(field) is not None and not isinstance(item[field], str):
+            return f'El campo {field} debe ser texto'
+    for field in ('name', 'url', 'username'):
+        max_length = getattr(Password, field).type.length
+        if len(item.get(field) or '') > max_length:
+            return f'El campo {field} no puede superar {max_length} caracteres'
+    return None
+
+@api.route('/passwords/bulk', methods=['POST'])
+@login_required
+def create_passwords_bulk():
+    """
+    Endpoint para almacenar varias contraseñas en una sola transacción.
+    Si algún elemento no es válido no se guarda ninguno.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, list) or not data:
+            return jsonify({'error': 'Se requiere una lista de contraseñas'}), 400
+
+        max_items = current_app.config.get('BULK_CREATE_MAX', 1000)
+        if len(data) > max_items:
+            return jsonify({'error': f'No se pueden crear más de {max_items} contraseñas a la vez'}), 400
+
+        master_key = session.get('master_key')
+        if not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+
+        results = []
+        for index, item in enumerate(data):
+            error = validate_bulk_item(item)
+            if error:
+                results.append({'index': index, 'success': False, 'error': error})
+            else:
+                results.append({'index': index, 'success': True})
+
+        if not all(result['success'] for result in results):
+            return jsonify({'created': 0, 'results': results}), 400
+
+        ids = Password.create_many(current_user.id, data, master_key)
+        if ids is None:
+            return jsonify({'error': 'Error al crear las contraseñas en la base de datos'}), 500
+
+        for result, password_id in zip(results, ids):
+            result['id'] = password_id
+        log_activity('create', count=len(ids))
+        return jsonify({'created': len(ids), 'results': results}), 201
+    except Exception as e:
+        return jsonify({'error': f'Error al crear las contraseñas: {str(e)}'}), 500
+
+@api.route('/passwords/search', methods=['GET'])
+@login_required
+def search_passwords():
+    """
+    Endpoint para buscar contraseñas por nombre, URL, usuario o comentarios.
+    Cada palabra se busca como prefijo; los resultados van ordenados por relevancia.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Se requiere un texto de búsqueda'}), 400
+
+        try:
+            limit = int(request.args.get('limit', current_app.config.get('SEARCH_PAGE_SIZE', 20)))
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit y offset deben ser números'}), 400
+        max_limit = current_app.config.get('PAGE_SIZE_MAX', 500)
+        if not (1 <= limit <= max_limit) or offset < 0:
+            return jsonify({'error': f'El límite debe estar entre 1 y {max_limit}'}), 400
+
+        # Pedir un resultado extra para saber si hay más páginas
+        ids = search_password_ids(current_user.id, query, limit + 1, offset)
+        has_more = len(ids) > limit
+        ids = ids[:limit]
+
+        metadata = get_vault_metadata(current_user.id)
+        if metadata is not None:
+            results = [
+                {field: metadata[i][field] for field in Password.LIST_FIELDS}
+                for i in ids if i in metadata
+            ]
+        else:
+            found = {p.id: p for p in Password.get_many_for_user(current_user.id, ids)}
+            results = Password.to_dicts([found[i] for i in ids if i in found])
+
+        log_activity('search', count=len(results))
+        return jsonify({
+            'passwords': results,
+            'limit': limit,
+            'offset': offset,
+            'next_offset': offset + limit if has_more else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/passwords/export', methods=['GET'])
+@login_required
+def export_passwords():
+    """
+    Endpoint para exportar la bóveda completa (descifrada) en JSON Lines o CSV.
+    La respuesta se genera por bloques a medida que se leen las filas.
+    """
+    export_format = request.args.get('format', 'jsonl').lower()
+    if export_format not in ('jsonl', 'csv'):
+        return jsonify({'error': 'El formato debe ser jsonl o csv'}), 400
+
+    master_key = session.get('master_key')
+    if not master_key:
+        return jsonify({'error': 'No se encontró la clave maestra'}), 401
+
+    chunks = Password.iter_export_for_user(
+        current_user.id,
+        master_key,
+        chunk_size=current_app.config.get('EXPORT_CHUNK_SIZE', 500)
+    )
+
+    def generate_jsonl():
+        for chunk in chunks:
+            yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in chunk)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=Password.EXPORT_FIELDS)
+        writer.writeheader()
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    log_activity('export')
+    filename = f"guardiapass-{datetime.utcnow().strftime('%Y%m%d')}.{export_format}"
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_jsonl(), 'application/x-ndjson'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store'
+        }
+    )
+
+@api.route('/passwords/changes', methods=['GET'])
+@login_required
+def get_password_changes():
+    """
+    Endpoint de sincronización incremental.
+    Con ?since=<versión> devuelve las contraseñas creadas o modificadas y los IDs
+    eliminados después de esa versión; sin since devuelve la bóveda completa.
+    En ambos casos incluye la versión actual, que el cliente envía en la siguiente
+    llamada. Admite ?include_password=true.
+    """
+    try:
+        include_password = request.args.get('include_password', '').lower() in ('1', 'true', 'yes')
+        master_key = session.get('master_key')
+        if include_password and not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+        since = request.args.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return jsonify({'error': 'since debe ser un número de versión'}), 400
+            if since < 0:
+                return jsonify({'error': 'since debe ser un número de versión'}), 400
+        
+        def build():
+            # La versión se lee antes que las filas: lo que se escriba entretanto
+            # se volverá a enviar en la siguiente llamada, nunca se pierde
+            version = User.get_vault_version(current_user.id)
+            if since is None:
+                changed = Password.query_for_user(current_user.id, 'created_at')
+                deleted = []
+            else:
+                changed = Password.query_changes_for_user(current_user.id, since)
+                deleted = PasswordTombstone.get_since(current_user.id, since)
+            # Las filas cambiadas se envían en streaming (en una sincronización
+            # completa son toda la bóveda)
+            return stream_json_object('changed', Password.iter_dicts(
+                changed,
+                include_password=include_password,
+                master_key=master_key,
+                fields=Password.CHANGE_FIELDS,
+                chunk_size=current_app.config.get('LISTING_CHUNK_SIZE', 500)
+            ), {
+                'deleted': [tombstone.to_dict() for tombstone in deleted],
+                'full': since is None,
+                'version': version
+            })
+        
+        response = conditional_response(vault_etag(current_user.id), build, include_password)
+        if response.status_code == 200:
+            log_activity('sync')
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/passwords/<int:password_id>', methods=['GET'])
 @login_required
 def get_password(password_id):
     """Endpoint para obtener una contraseña específica"""
     try:
-        password = Password.get(password_id, current_user.id, current_user.master_key)
-        if not password:
-            return jsonify({'error': 'Contraseña no encontrada'}), 404
+        master_key = session.get('master_key')
+        if not master_key:
+            return jsonify({'error': 'No se encontró la clave maestra'}), 401
+        
+        def build():
+            password = Password.get(password_id)
+            if not password or password.user_id != current_user.id:
+                return make_response(jsonify({'error': 'Contraseña no encontrada'}), 404)
             
-        return jsonify(password.to_dict(
-            include_password=True,
-            master_key=current_user.master_key
-        ))
+            log_activity('view', password)
+            return jsonify(password.to_dict(
+                include_password=True,
+                master_key=master_key
+            ))
+        
+        return conditional_response(vault_etag(current_user.id), build, include_password=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -101,6 +539,7 @@ def update_password(password_id):
                 'error': 'Error al actualizar la contraseña'
             }), 500
 
+        log_activity('update', password)
         return jsonify({
             'success': True,
             'message': 'Contraseña actualizada correctamente',
@@ -121,7 +560,12 @@ def delete_password(password_id):
         if not password or password.user_id != current_user.id:
             return jsonify({'error': 'Contraseña no encontrada'}), 404
 
-        password.delete()
+        # El nombre se lee antes de borrar la fila
+        name = password.name
+        if not password.delete():
+            return jsonify({'error': 'Error al eliminar la contraseña'}), 500
+
+        log_activity('delete', password_id=password_id, target=name)
         return jsonify({'message': 'Contraseña eliminada exitosamente'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -188,6 +632,34 @@ def check_password_strength():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/stats', methods=['GET'])
+@login_required
+def get_stats():
+    """Estadísticas del usuario (las mismas que muestra el perfil)"""
+    return jsonify(dict(get_user_stats(current_user.id), recent_activity=recent_activity(current_user.id)))
+
+@api.route('/metrics', methods=['GET'])
+@login_required
+def get_metrics():
+    """
+    Endpoint con contadores internos de rendimiento (sin datos de usuario).
+    Los contadores son de todo el proceso, así que sólo se exponen con
+    METRICS_ENABLED y a usuarios autenticados.
+    """
+    if not current_app.config.get('METRICS_ENABLED', False):
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+    session_stats = getattr(current_app.session_interface, 'stats', None)
+    return jsonify({
+        'cipher_cache': cipher_cache.stats(),
+        'kdf_executor': kdf_executor.stats(),
+        'stats_cache': stats_cache.stats(),
+        'identity_cache': identity_cache.stats(),
+        'activity_log': activity_writer.stats(),
+        'vault_cache': vault_cache.stats(),
+        'session_store': session_stats() if session_stats else None,
+        'compression': compression_stats.stats()
+    })
+
 @api.errorhandler(404)
 def not_found_error(error):
     return jsonify({'error': 'Recurso no encontrado'}), 404
@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from models.user import User
+from models.identity import identity_cache
+from models.activity import log_activity
+from utils.encryptor import cipher_cache
+from utils.server_session import regenerate_session
 from utils.password_generator import PasswordGenerator
 
 auth = Blueprint('auth', __name__)
@@ -22,12 +26,15 @@ def login():
             flash('Por favor verifica tus credenciales e intenta nuevamente.', 'error')
             return redirect(url_for('auth.login'))
             
+        # ID de sesión nuevo al autenticarse (sesiones en el servidor)
+        regenerate_session()
         login_user(user, remember=remember)
         
         # Configurar la sesión
         session.permanent = True
         session['user_id'] = user.id
         session['master_key'] = user.master_key
+        log_activity('login', user_id=user.id)
         
         next_page = request.args.get('next')
         if next_page:
@@ -77,8 +84,12 @@ def register():
 @auth.route('/logout')
 @login_required
 def logout():
-    # Limpiar la clave maestra de la sesión
-    session.pop('master_key', None)
+    # Limpiar la clave maestra de la sesión, su encriptador y la identidad cacheados
+    master_key = session.pop('master_key', None)
+    if master_key:
+        cipher_cache.invalidate(master_key)
+    identity_cache.invalidate(current_user.id)
+    log_activity('logout')
     session.pop('user_id', None)
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'success')
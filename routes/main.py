@@ -1,9 +1,9 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, session
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
 from models.password import Password
-from utils.password_generator import PasswordGenerator
+from models.stats import get_user_stats
+from models.activity import recent_activity
 from datetime import datetime, timezone
-from urllib.parse import urlparse
 
 main = Blueprint('main', __name__)
 
@@ -24,9 +24,8 @@ def index():
 @main.route('/dashboard')
 @login_required
 def dashboard():
-    # Obtener todas las contraseñas del usuario
-    passwords = Password.get_all_for_user(current_user.id)
-    return render_template('dashboard.html', passwords=passwords)
+    # El listado se carga desde /api/passwords; la plantilla no necesita las filas
+    return render_template('dashboard.html')
 
 @main.route('/manage')
 @login_required
@@ -36,47 +35,14 @@ def manage():
 @main.route('/profile')
 @login_required
 def profile():
-    # Obtener todas las contraseñas del usuario
-    passwords = Password.get_all_for_user(current_user.id)
+    # Estadísticas agregadas en SQL (y cacheadas hasta la siguiente escritura)
+    stats = get_user_stats(current_user.id)
+    strength = stats['strength']
+    weak_count = strength['weak']
+    medium_count = strength['medium']
+    strong_count = strength['strong']
     
-    # Estadísticas básicas
-    last_update = passwords[0].created_at if passwords else None
-    
-    # Obtener dominios únicos (extraer dominio de las URLs)
-    unique_domains = len(set(urlparse(p.url).netloc for p in passwords if p.url))
-    
-    # Contraseñas antiguas (>90 días)
-    old_passwords = sum(1 for p in passwords if (datetime.utcnow() - p.created_at).days > 90)
-    
-    # Actividad reciente (últimas 5 contraseñas)
-    recent_activities = [
-        {'date': p.created_at, 'site': p.name, 'action': 'Creada'}
-        for p in sorted(passwords, key=lambda x: x.created_at, reverse=True)[:5]
-    ]
-    
-    # Calcular estadísticas de fortaleza usando el generador existente
-    password_generator = PasswordGenerator()
-    weak_count = medium_count = strong_count = 0
-    
-    for pwd in passwords:
-        # Obtener contraseña descifrada usando to_dict
-        pwd_data = pwd.to_dict(include_password=True, master_key=session.get('master_key'))
-        if not pwd_data.get('password'):
-            continue
-            
-        is_valid, _ = password_generator.validate_password(pwd_data['password'])
-        strength = len(pwd_data['password']) + sum(1 for c in pwd_data['password'] if c.isupper()) + \
-                  sum(1 for c in pwd_data['password'] if c.isdigit()) + \
-                  sum(1 for c in pwd_data['password'] if not c.isalnum())
-        
-        if strength < 10:
-            weak_count += 1
-        elif strength < 15:
-            medium_count += 1
-        else:
-            strong_count += 1
-    
-    total = len(passwords)
+    total = stats['total']
     if total > 0:
         weak_percent = (weak_count / total) * 100
         medium_percent = (medium_count / total) * 100
@@ -84,12 +50,16 @@ def profile():
     else:
         weak_percent = medium_percent = strong_percent = 0
     
+    # Listado de contraseñas antiguas (sólo si hay alguna)
+    old_password_list = Password.get_old_for_user(current_user.id) if stats['old_passwords'] else []
+    
     return render_template('profile.html',
-                         passwords=passwords,
-                         last_update=last_update,
-                         unique_domains=unique_domains,
-                         old_passwords=old_passwords,
-                         recent_activities=recent_activities,
+                         total_passwords=total,
+                         last_update=stats['last_update'],
+                         unique_domains=stats['unique_domains'],
+                         old_passwords=stats['old_passwords'],
+                         old_password_list=old_password_list,
+                         recent_activities=recent_activity(current_user.id),
                          weak_count=weak_count,
                          medium_count=medium_count,
                          strong_count=strong_count,
@@ -1,10 +1,15 @@
 import os
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, make_response
 from dotenv import load_dotenv
 from config.config import config
 from flask_login import LoginManager
-from models.user import User
+from models.identity import load_identity
 from models import init_app
+from utils.encryptor import init_app as init_encryptor
+from utils.kdf_executor import init_app as init_kdf_executor, KDFSaturatedError
+from utils.server_session import init_app as init_server_session
+from utils.json_stream import init_app as init_json_stream
+from utils.compression import init_app as init_compression
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -56,6 +61,21 @@ def create_app(config_name='default'):
     # Inicializar SQLAlchemy
     init_app(app)
     
+    # Configurar la caché de encriptadores
+    init_encryptor(app)
+    
+    # Configurar el pool de derivación de claves
+    init_kdf_executor(app)
+    
+    # Tamaño de bloque de las respuestas JSON en streaming
+    init_json_stream(app)
+    
+    # Comprimir las respuestas HTML/JSON y servir los estáticos precomprimidos
+    init_compression(app)
+    
+    # Guardar las sesiones en el servidor (la cookie sólo lleva el ID)
+    init_server_session(app)
+    
     # Manejar errores personalizados
     register_error_handlers(app)
     
@@ -63,7 +83,8 @@ def create_app(config_name='default'):
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.get(user_id)
+    # Identidad cacheada (sin secretos): evita consultar la tabla user en cada petición
+    return load_identity(user_id)
 
 def register_error_handlers(app):
     @app.errorhandler(404)
@@ -81,6 +102,17 @@ def register_error_handlers(app):
         app.logger.info(f'Forbidden access: {request.url}')
         return render_template('errors/404.html'), 403
 
+    @app.errorhandler(KDFSaturatedError)
+    def kdf_saturated_error(error):
+        app.logger.warning(f'KDF queue saturated: {request.method} {request.url}')
+        if request.path.startswith('/api/'):
+            response = jsonify({'error': 'Servidor ocupado, inténtalo de nuevo en unos segundos'})
+        else:
+            response = make_response(render_template('errors/503.html'))
+        response.status_code = 503
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
     @app.errorhandler(405)
     def method_not_allowed_error(error):
         app.logger.info(f'Method not allowed: {request.method} {request.url}')
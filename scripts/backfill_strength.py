@@ -0,0 +1,31 @@
+import sys
+import os
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run import create_app
+from models.user import User
+from models.password import Password
+from models.sharding import use_user_shard
+
+def backfill_strength(batch_size=500):
+    """
+    Calcula y guarda la fortaleza de las contraseñas creadas antes de que se
+    almacenara. Sólo procesa las filas sin categoría, así que puede volver a
+    lanzarse sin repetir trabajo.
+    """
+    app = create_app(os.getenv('FLASK_ENV') or 'default')
+    
+    with app.app_context():
+        total = 0
+        for user in User.query.order_by(User.id).all():
+            with use_user_shard(user.id):
+                updated = Password.backfill_strength(user.id, user.master_key, batch_size)
+            if updated:
+                print(f"Usuario {user.username}: {updated} contraseñas actualizadas")
+            total += updated
+        print(f"Fortaleza calculada para {total} contraseñas")
+
+if __name__ == '__main__':
+    backfill_strength(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
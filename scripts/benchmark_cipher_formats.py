@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.encryptor import PasswordEncryptor, CIPHER_FORMATS
+from utils.password_generator import PasswordGenerator
+
+def benchmark(rows=5000, length=16):
+    """
+    Compara los formatos de cifrado: bytes almacenados por fila y
+    operaciones por segundo de cifrado y descifrado.
+    """
+    generator = PasswordGenerator()
+    passwords = [generator.generate_password(length=length) for _ in range(rows)]
+    encryptor = PasswordEncryptor()
+    
+    print(f"{rows} contraseñas de {length} caracteres")
+    print(f"{'formato':<10} {'bytes/fila':>11} {'cifrado/s':>12} {'descifrado/s':>14}")
+    for cipher_format in CIPHER_FORMATS:
+        start = time.perf_counter()
+        tokens = [encryptor.encrypt(p, cipher_format=cipher_format) for p in passwords]
+        encrypt_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        for token in tokens:
+            encryptor.decrypt(token)
+        decrypt_time = time.perf_counter() - start
+        
+        size = sum(len(token) for token in tokens) / rows
+        print(f"{cipher_format:<10} {size:>11.1f} {rows / encrypt_time:>12.0f} {rows / decrypt_time:>14.0f}")
+
+if __name__ == '__main__':
+    benchmark(*(int(arg) for arg in sys.argv[1:3]))
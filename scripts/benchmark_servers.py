@@ -0,0 +1,150 @@
+import sys
+import os
+import json
+import socket
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from urllib.parse import urlencode
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import config, ProductionConfig
+
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+
+class BenchmarkConfig(ProductionConfig):
+    """Base de datos temporal y cookies sin HTTPS para el servidor local"""
+    SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
+    SESSION_COOKIE_SECURE = False
+
+config['benchmark'] = BenchmarkConfig
+
+USERNAME = 'benchmark'
+PASSWORD = 'Benchmark-Pass-2024!'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'El servidor no responde en el puerto {port}')
+
+
+def start_wsgi(port):
+    """Servidor WSGI con un hilo por petición (el de app.run)"""
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from run import create_app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, create_app('benchmark'), threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port):
+    """Servidor uvicorn con el punto de entrada de asgi.py"""
+    import uvicorn
+    from asgi import create_asgi_app
+    server = uvicorn.Server(uvicorn.Config(create_asgi_app('benchmark'), host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    def stop():
+        server.should_exit = True
+    return stop
+
+
+def login(base_url, entries):
+    """Crea el usuario de prueba (la primera vez) e inicia sesión"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    form = urlencode({'username': USERNAME, 'master_password': PASSWORD, 'confirm_password': PASSWORD}).encode()
+    opener.open(f'{base_url}/auth/register', form)
+    opener.open(f'{base_url}/auth/login', urlencode({'username': USERNAME, 'password': PASSWORD}).encode())
+
+    existing = json.loads(opener.open(f'{base_url}/api/passwords?fields=id').read())
+    if len(existing) < entries:
+        items = [
+            {'name': f'site{i}', 'url': f'https://site{i}.example.com', 'username': 'user', 'password': f'Secret-{i}-xyz'}
+            for i in range(entries - len(existing))
+        ]
+        request = urllib.request.Request(
+            f'{base_url}/api/passwords/bulk',
+            data=json.dumps(items).encode(),
+            headers={'Content-Type': 'application/json'}
+        )
+        opener.open(request)
+    return opener
+
+
+def run_load(opener, url, requests, concurrency):
+    """Lanza las peticiones con concurrency clientes a la vez y mide la latencia"""
+    def fetch(_):
+        start = time.perf_counter()
+        with opener.open(url) as response:
+            response.read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        'rps': requests / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000
+    }
+
+
+def benchmark(requests=400, concurrency=16, entries=500):
+    """
+    Compara el rendimiento con peticiones concurrentes del modo WSGI
+    (servidor con hilos de Werkzeug) y del modo ASGI (uvicorn + asgi.py).
+    """
+    servers = [('wsgi', start_wsgi)]
+    try:
+        import uvicorn  # noqa: F401
+        import asgiref  # noqa: F401
+        servers.append(('asgi', start_asgi))
+    except ImportError:
+        print('uvicorn/asgiref no instalados: sólo se mide el modo WSGI')
+
+    paths = [
+        ('listado', '/api/passwords'),
+        ('listado+descifrado', '/api/passwords?include_password=true'),
+        ('estadísticas', '/api/stats')
+    ]
+    print(f"{requests} peticiones, {concurrency} clientes, {entries} contraseñas")
+    print(f"{'modo':<6} {'endpoint':<20} {'pet/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, start in servers:
+        port = free_port()
+        stop = start(port)
+        try:
+            wait_for(port)
+            base_url = f'http://127.0.0.1:{port}'
+            opener = login(base_url, entries)
+            for label, path in paths:
+                result = run_load(opener, base_url + path, requests, concurrency)
+                print(f"{mode:<6} {label:<20} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+        finally:
+            stop()
+
+if __name__ == '__main__':
+    benchmark(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,92 @@
+import sys
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.config import config, ProductionConfig
+from run import create_app
+from models import db
+from models.user import User
+from models.password import Password
+from models.sharding import use_user_shard
+
+
+def benchmark_config(shard_count):
+    """Base de datos temporal con shard_count shards y derivación de claves rápida"""
+    directory = tempfile.mkdtemp()
+
+    class ShardBenchmarkConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'benchmark.db')}"
+        SHARD_COUNT = shard_count
+        SHARD_DIRECTORY = directory
+        PBKDF2_ITERATIONS = 1000
+        KDF_WORKERS = 0
+        SESSION_BACKEND = 'memory'
+
+    name = f'benchmark_shards_{shard_count}'
+    config[name] = ShardBenchmarkConfig
+    return name
+
+
+def run_writes(app, user_ids, threads, writes):
+    """
+    Lanza writes escrituras (Password.create) por hilo, cada hilo con un
+    usuario distinto, y mide el rendimiento y la latencia de cada commit.
+    """
+    master_keys = {}
+    with app.app_context():
+        for user_id in user_ids:
+            master_keys[user_id] = db.session.get(User, user_id).master_key
+    failures = []
+    lock = threading.Lock()
+
+    def worker(position):
+        user_id = user_ids[position % len(user_ids)]
+        latencies = []
+        with app.app_context(), use_user_shard(user_id):
+            for i in range(writes):
+                start = time.perf_counter()
+                created = Password.create(
+                    user_id, f'site{position}-{i}', f'https://site{i}.example.com', 'user',
+                    f'Secret-{position}-{i}-xyz', master_keys[user_id]
+                )
+                latencies.append(time.perf_counter() - start)
+                if created is None:
+                    with lock:
+                        failures.append(user_id)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = sorted(latency for result in executor.map(worker, range(threads)) for latency in result)
+    elapsed = time.perf_counter() - start
+    return {
+        'wps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'failed': len(failures)
+    }
+
+
+def benchmark(shards=4, threads=16, writes=100):
+    """
+    Compara el rendimiento de escrituras concurrentes de varios usuarios con
+    todas las contraseñas en un único fichero SQLite y repartidas en shards.
+    """
+    print(f"{threads} hilos (un usuario cada uno), {writes} escrituras por hilo")
+    print(f"{'shards':<7} {'escr/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'fallos':>7}")
+    for shard_count in (1, shards):
+        app = create_app(benchmark_config(shard_count))
+        with app.app_context():
+            user_ids = [User.create(f'user{i}', 'Benchmark-Pass-2024!').id for i in range(threads)]
+        result = run_writes(app, user_ids, threads, writes)
+        print(f"{shard_count:<7} {result['wps']:>8.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['failed']:>7}")
+
+if __name__ == '__main__':
+    benchmark(*(int(arg) for arg in sys.argv[1:4]))
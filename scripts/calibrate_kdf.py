@@ -0,0 +1,73 @@
+import sys
+import os
+import time
+import argparse
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.encryptor import PasswordEncryptor
+
+SAMPLE_PASSWORD = 'Calibracion-GuardiaPass-2024!'
+
+def measure(kdf_params, rounds=3):
+    """Devuelve el tiempo medio (en segundos) de una derivación con los parámetros dados"""
+    salt = os.urandom(kdf_params['salt_length'])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        PasswordEncryptor.generate_key_from_master(SAMPLE_PASSWORD, salt=salt, kdf_params=kdf_params)
+    return (time.perf_counter() - start) / rounds
+
+def calibrate_pbkdf2(target, salt_length):
+    """Escala linealmente las iteraciones de PBKDF2 hasta el tiempo objetivo"""
+    params = {'algorithm': 'pbkdf2-sha256', 'salt_length': salt_length, 'iterations': 50000}
+    elapsed = measure(params)
+    iterations = max(int(params['iterations'] * target / elapsed), 10000)
+    # Redondear a millares y verificar
+    params['iterations'] = round(iterations, -3)
+    return params, measure(params)
+
+def calibrate_scrypt(target, salt_length, max_memory_mb):
+    """Duplica N de scrypt hasta alcanzar el tiempo objetivo o el límite de memoria"""
+    params = {'algorithm': 'scrypt', 'salt_length': salt_length, 'n': 2 ** 12, 'r': 8, 'p': 1}
+    elapsed = measure(params)
+    while elapsed < target:
+        candidate = dict(params, n=params['n'] * 2)
+        if 128 * candidate['n'] * candidate['r'] > max_memory_mb * 1024 * 1024:
+            break
+        candidate_elapsed = measure(candidate)
+        # Quedarse con el valor más cercano al objetivo
+        if abs(candidate_elapsed - target) > abs(elapsed - target):
+            break
+        params, elapsed = candidate, candidate_elapsed
+    return params, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mide el coste de la derivación de claves en este equipo y recomienda parámetros'
+    )
+    parser.add_argument('--target-ms', type=float, default=250, help='Latencia objetivo por derivación')
+    parser.add_argument('--salt-length', type=int, default=32, help='Longitud del salt en bytes')
+    parser.add_argument('--max-memory-mb', type=int, default=64, help='Memoria máxima para scrypt')
+    args = parser.parse_args()
+    target = args.target_ms / 1000
+    
+    print(f"Objetivo: {args.target_ms:.0f} ms por derivación ({os.cpu_count()} CPUs)")
+    
+    pbkdf2, pbkdf2_time = calibrate_pbkdf2(target, args.salt_length)
+    print(f"\nPBKDF2-SHA256: {pbkdf2['iterations']} iteraciones -> {pbkdf2_time * 1000:.0f} ms")
+    print("  KDF_ALGORITHM=pbkdf2-sha256")
+    print(f"  PBKDF2_ITERATIONS={pbkdf2['iterations']}")
+    
+    scrypt, scrypt_time = calibrate_scrypt(target, args.salt_length, args.max_memory_mb)
+    memory_mb = 128 * scrypt['n'] * scrypt['r'] / (1024 * 1024)
+    print(f"\nscrypt: N=2^{scrypt['n'].bit_length() - 1}, r={scrypt['r']}, p={scrypt['p']} "
+          f"-> {scrypt_time * 1000:.0f} ms, {memory_mb:.0f} MB")
+    print("  KDF_ALGORITHM=scrypt")
+    print(f"  SCRYPT_N={scrypt['n']}")
+    
+    print(f"\nCon KDF_WORKERS={os.cpu_count()} el nodo admite unas "
+          f"{os.cpu_count() / max(pbkdf2_time, 1e-6):.0f} derivaciones PBKDF2 por segundo.")
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from run import create_app
 from models import db
 from models.user import User
 from models.password import Password
+from models.sharding import use_user_shard
 from utils.encryptor import PasswordEncryptor
 
 def insert_test_passwords():
@@ -66,36 +67,38 @@ def insert_test_passwords():
             }
         ]
 
-        # Insertar cada contraseña
-        for data in test_data:
-            try:
-                # Crear la contraseña usando el método del modelo que maneja la encriptación
-                password = Password.create(
-                    user_id=user.id,
-                    name=data['name'],
-                    url=data['url'],
-                    username=data['username'],
-                    password=data['password'],
-                    master_key=user.master_key,
-                    comments=data['comments']
-                )
+        # Las contraseñas se guardan en el shard del usuario
+        with use_user_shard(user.id):
+            # Insertar cada contraseña
+            for data in test_data:
+                try:
+                    # Crear la contraseña usando el método del modelo que maneja la encriptación
+                    password = Password.create(
+                        user_id=user.id,
+                        name=data['name'],
+                        url=data['url'],
+                        username=data['username'],
+                        password=data['password'],
+                        master_key=user.master_key,
+                        comments=data['comments']
+                    )
                 
-                # Actualizar la fecha de creación
-                password.created_at = data['created_at']
-                db.session.add(password)
+                    # Actualizar la fecha de creación
+                    password.created_at = data['created_at']
+                    db.session.add(password)
                 
+                except Exception as e:
+                    print(f"Error al insertar {data['name']}: {str(e)}")
+                    db.session.rollback()
+                    continue
+
+            # Guardar todos los cambios
+            try:
+                db.session.commit()
+                print("Datos de prueba insertados correctamente")
             except Exception as e:
-                print(f"Error al insertar {data['name']}: {str(e)}")
+                print(f"Error al guardar los cambios: {str(e)}")
                 db.session.rollback()
-                continue
-
-        # Guardar todos los cambios
-        try:
-            db.session.commit()
-            print("Datos de prueba insertados correctamente")
-        except Exception as e:
-            print(f"Error al guardar los cambios: {str(e)}")
-            db.session.rollback()
 
 if __name__ == '__main__':
     insert_test_passwords()
@@ -0,0 +1,33 @@
+import sys
+import os
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run import create_app
+from models.user import User
+from models.password import Password
+from models.sharding import use_user_shard
+
+def migrate_ciphertexts(batch_size=500):
+    """
+    Barrido en segundo plano: migra al formato de cifrado configurado
+    (CIPHER_FORMAT) todas las contraseñas guardadas como tokens Fernet o en
+    sobres de la versión 0x02.
+    Cada bloque se confirma por separado, así que puede interrumpirse y
+    volver a lanzarse sin perder el trabajo hecho.
+    """
+    app = create_app(os.getenv('FLASK_ENV') or 'default')
+    
+    with app.app_context():
+        total = 0
+        for user in User.query.order_by(User.id).all():
+            with use_user_shard(user.id):
+                migrated = Password.migrate_legacy_ciphertexts(user.id, user.master_key, batch_size)
+            if migrated:
+                print(f"Usuario {user.username}: {migrated} contraseñas migradas")
+            total += migrated
+        print(f"Migración completada: {total} contraseñas migradas")
+
+if __name__ == '__main__':
+    migrate_ciphertexts(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,49 @@
+import sys
+import os
+import gzip
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import ENCODING_EXTENSIONS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.ico')
+
+def precompress_static(min_size=1024):
+    """
+    Genera las versiones .gz (y .br si brotli está instalado) de los ficheros
+    estáticos comprimibles, con el nivel máximo de compresión. La aplicación las
+    envía en lugar del original cuando el cliente las acepta.
+    """
+    for root, _, files in os.walk(STATIC_FOLDER):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            
+            variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            for encoding, compressed in variants.items():
+                target = path + ENCODING_EXTENSIONS[encoding]
+                if len(compressed) >= len(data):
+                    # No compensa: eliminar una versión anterior si la hubiera
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                print(f"{os.path.relpath(target, STATIC_FOLDER)}: {len(data)} -> {len(compressed)} bytes")
+
+if __name__ == '__main__':
+    precompress_static(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
@@ -0,0 +1,59 @@
+import sys
+import os
+import argparse
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run import create_app
+from models.user import User
+from models.key_rotation import KeyRotation
+from models.sharding import use_user_shard
+
+def rotate_user(user, chunk_size):
+    """Inicia o reanuda la rotación de la clave de un usuario y la completa"""
+    rotation = KeyRotation.get_active(user.id)
+    if rotation is not None:
+        print(f"Reanudando la rotación de {user.username} desde el ID {rotation.last_id}")
+    else:
+        rotation = KeyRotation.start(user)
+        print(f"Iniciando la rotación de {user.username}")
+    
+    while rotation.status == 'running':
+        processed = rotation.run_chunk(chunk_size)
+        if processed:
+            print(f"  {rotation.rotated} contraseñas re-cifradas (último ID {rotation.last_id})")
+    
+    print(f"Rotación de {user.username} completada: {rotation.rotated} re-cifradas, {rotation.failed} con errores")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Rota la clave maestra re-cifrando las contraseñas por bloques (reanudable)'
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--user', help='Nombre del usuario cuya clave se rota')
+    group.add_argument('--all', action='store_true', help='Rotar la clave de todos los usuarios')
+    group.add_argument('--resume', action='store_true', help='Reanudar sólo las rotaciones interrumpidas')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Filas por bloque confirmado')
+    args = parser.parse_args()
+    
+    app = create_app(os.getenv('FLASK_ENV') or 'default')
+    
+    with app.app_context():
+        if args.user:
+            user = User.get_by_username(args.user)
+            if not user:
+                print(f"Error: Usuario '{args.user}' no encontrado")
+                return
+            users = [user]
+        elif args.resume:
+            users = [User.get(r.user_id) for r in KeyRotation.query.filter_by(status='running').all()]
+        else:
+            users = User.query.order_by(User.id).all()
+        
+        for user in users:
+            with use_user_shard(user.id):
+                rotate_user(user, args.chunk_size)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import sys
+import os
+import argparse
+
+# Añadir el directorio raíz al path para poder importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run import create_app
+from models import db
+from models.sharding import SHARDED_TABLES, shard_settings, shard_bind_key
+
+# Las filas de vault_version se combinan quedándose con la versión mayor, para
+# que los clientes que sincronizan por versión no reciban una versión anterior
+UPSERT = {
+    'vault_version': 'ON CONFLICT(user_id) DO UPDATE SET version = max(version, excluded.version)'
+}
+
+
+def copy_table(connection, table, index, count):
+    """
+    Copia al shard (main) las filas de central.table de los usuarios del shard,
+    conservando los ID. Las filas ya copiadas se ignoran.
+
+    Returns:
+        tuple: (int, int) Filas copiadas y filas del shard que faltan en la copia
+    """
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+    keys = ' AND '.join(f'target."{column.name}" = source."{column.name}"' for column in table.primary_key.columns)
+    params = {'count': count, 'index': index}
+    verb = 'INSERT' if table.name in UPSERT else 'INSERT OR IGNORE'
+    copied = connection.exec_driver_sql(
+        f'{verb} INTO main."{table.name}" ({columns}) '
+        f'SELECT {columns} FROM central."{table.name}" WHERE user_id % :count = :index '
+        + UPSERT.get(table.name, ''),
+        params
+    ).rowcount
+    # Una fila no se ha copiado si en el shard no hay otra con la misma clave y el mismo usuario
+    missing = connection.exec_driver_sql(
+        f'SELECT count(*) FROM central."{table.name}" AS source WHERE source.user_id % :count = :index '
+        f'AND NOT EXISTS (SELECT 1 FROM main."{table.name}" AS target WHERE {keys} AND target.user_id = source.user_id)',
+        params
+    ).scalar()
+    return copied, missing
+
+
+def split_shards(purge=False):
+    """
+    Reparte las tablas de la bóveda de la base de datos central entre los
+    shards configurados (SHARD_COUNT). Puede lanzarse varias veces; con purge
+    elimina de la base de datos central las filas ya copiadas.
+    """
+    app = create_app(os.getenv('FLASK_ENV') or 'default')
+
+    with app.app_context():
+        count = shard_settings['count']
+        if not count:
+            print("Error: SHARD_COUNT debe ser mayor que 0")
+            return False
+
+        central_path = db.engine.url.database
+        complete = True
+        for index in range(count):
+            with db.engines[shard_bind_key(index)].connect() as connection:
+                connection.exec_driver_sql('ATTACH DATABASE :path AS central', {'path': central_path})
+                try:
+                    for name in SHARDED_TABLES:
+                        copied, missing = copy_table(connection, db.metadata.tables[name], index, count)
+                        connection.commit()
+                        print(f"Shard {index}, {name}: {copied} filas copiadas" + (f", {missing} en conflicto" if missing else ""))
+                        complete = complete and not missing
+                finally:
+                    connection.rollback()
+                    connection.exec_driver_sql('DETACH DATABASE central')
+
+        if not complete:
+            # IDs ya usados en el shard por filas escritas antes de copiar los datos
+            print("Error: hay filas sin copiar; no se elimina nada de la base de datos central")
+            return False
+
+        if purge:
+            with db.engine.begin() as connection:
+                for name in SHARDED_TABLES:
+                    deleted = connection.exec_driver_sql(f'DELETE FROM "{name}"').rowcount
+                    print(f"Base de datos central, {name}: {deleted} filas eliminadas")
+        return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Copia las contraseñas de la base de datos central a los shards de cada usuario'
+    )
+    parser.add_argument('--purge', action='store_true', help='Eliminar de la base de datos central las filas copiadas')
+    args = parser.parse_args()
+    sys.exit(0 if split_shards(args.purge) else 1)
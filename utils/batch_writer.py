@@ -0,0 +1,190 @@
+import os
+import queue
+import threading
+import time
+
+# Marca que despierta al hilo escritor para que termine
+_STOP = object()
+
+
+class BatchWriter:
+    """
+    Escritor asíncrono por lotes: submit() deja el registro en una cola acotada
+    y vuelve enseguida; un hilo en segundo plano lo entrega a write_batch junto
+    con los demás cuando hay batch_size registros o han pasado interval segundos.
+
+    Si la cola está llena el registro se descarta (y se cuenta) en lugar de
+    bloquear la petición. Al cerrar, los registros pendientes se escriben
+    (shutdown_policy='flush') o se descartan ('drop').
+    """
+
+    def __init__(self, name='batch-writer', write_batch=None, max_queue=10000, batch_size=200,
+                 interval=1.0, shutdown_policy='flush'):
+        self.name = name
+        self.write_batch = write_batch
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self.shutdown_policy = shutdown_policy
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+
+    def configure(self, write_batch=None, max_queue=None, batch_size=None, interval=None, shutdown_policy=None):
+        """Ajusta los parámetros; el tamaño de la cola sólo cambia mientras está vacía"""
+        with self._lock:
+            if write_batch is not None:
+                self.write_batch = write_batch
+            if batch_size is not None:
+                self.batch_size = max(batch_size, 1)
+            if interval is not None:
+                self.interval = interval
+            if shutdown_policy is not None:
+                self.shutdown_policy = shutdown_policy
+            if max_queue is not None and max_queue != self.max_queue and self._queue.empty():
+                self.max_queue = max_queue
+                self._queue = queue.Queue(maxsize=max_queue)
+
+    def submit(self, record):
+        """
+        Encola un registro para escribirlo en el siguiente lote.
+
+        Returns:
+            bool: False si la cola estaba llena y el registro se ha descartado
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _ensure_started(self):
+        # El hilo se arranca en el primer uso y de nuevo tras un fork (los
+        # procesos hijos de gunicorn/uvicorn no heredan los hilos del padre)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _collect(self):
+        """Espera el primer registro y reúne el lote hasta batch_size o interval"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            print(f"Error writing {self.name} batch: {str(e)}")
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.write_seconds += time.perf_counter() - started
+
+    def write_now(self, record):
+        """Escribe un registro en el hilo actual, sin cola (modo síncrono)"""
+        with self._lock:
+            self.submitted += 1
+        self._write([record])
+
+    def flush(self):
+        """Escribe en el hilo actual todos los registros que hay en la cola"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not _STOP:
+                    batch.append(record)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        """
+        Detiene el hilo escritor. Con shutdown_policy='flush' escribe antes los
+        registros pendientes; con 'drop' los descarta.
+        """
+        if self.shutdown_policy == 'drop':
+            discarded = 0
+            while True:
+                try:
+                    if self._queue.get_nowait() is not _STOP:
+                        discarded += 1
+                except queue.Empty:
+                    break
+            with self._lock:
+                self.dropped += discarded
+
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        self._thread = None
+        # Lo que el hilo no haya llegado a escribir
+        self.flush()
+
+    def stats(self):
+        """Devuelve los contadores del escritor"""
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'submitted': self.submitted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+                'avg_batch': (self.written / self.batches) if self.batches else 0.0,
+                'avg_write_ms': (self.write_seconds * 1000 / self.batches) if self.batches else 0.0
+            }
@@ -0,0 +1,244 @@
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+import gzip
+import mimetypes
+import os
+import threading
+import time
+import zlib
+
+# brotli es opcional: si está instalado se prefiere cuando el cliente lo acepta
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensión de los ficheros estáticos precomprimidos (scripts/precompress_static.py)
+ENCODING_EXTENSIONS = {
+    'br': '.br',
+    'gzip': '.gz'
+}
+
+compression_settings = {
+    'enabled': True,
+    'min_size': 1024,
+    'gzip_level': 6,
+    'brotli_quality': 5,
+    'streaming': True,
+    'mimetypes': ('text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript', 'text/javascript')
+}
+
+
+class CompressionStats:
+    """Contadores de la compresión de respuestas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.by_encoding = {}
+
+    def record(self, encoding, size_in, size_out, cpu_seconds):
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+            self.cpu_seconds += cpu_seconds
+            self.by_encoding[encoding] = self.by_encoding.get(encoding, 0) + 1
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def stats(self):
+        """Devuelve los contadores: ratio = bytes comprimidos / bytes originales"""
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'skipped': self.skipped,
+                'by_encoding': dict(self.by_encoding),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': (self.bytes_out / self.bytes_in) if self.bytes_in else 0.0,
+                'avg_cpu_ms': (self.cpu_seconds * 1000 / self.compressed) if self.compressed else 0.0
+            }
+
+
+compression_stats = CompressionStats()
+
+
+def accepted_encodings():
+    """Codificaciones que acepta el cliente (Accept-Encoding), en orden de preferencia"""
+    accept = request.accept_encodings
+    return [encoding for encoding in ENCODING_EXTENSIONS if accept[encoding]]
+
+
+def negotiate_encoding():
+    """Elige br (si está instalado) o gzip para comprimir al vuelo, o None"""
+    for encoding in accepted_encodings():
+        if encoding != 'br' or brotli is not None:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=compression_settings['brotli_quality'])
+    return gzip.compress(data, compresslevel=compression_settings['gzip_level'])
+
+
+def stream_compressor(encoding):
+    """
+    Compresor incremental: devuelve (process, finish). process(chunk) comprime
+    un fragmento y vacía el compresor para que el cliente lo reciba enseguida;
+    finish() devuelve el final del flujo.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=compression_settings['brotli_quality'])
+        return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+    # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+    compressor = zlib.compressobj(compression_settings['gzip_level'], zlib.DEFLATED, 31)
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    """Comprime fragmento a fragmento el cuerpo de una respuesta en streaming"""
+    process, finish = stream_compressor(encoding)
+    size_in = size_out = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                continue
+            started = time.thread_time()
+            compressed = process(chunk)
+            cpu_seconds += time.thread_time() - started
+            size_in += len(chunk)
+            size_out += len(compressed)
+            yield compressed
+        tail = finish()
+        size_out += len(tail)
+        yield tail
+        compression_stats.record(encoding, size_in, size_out, cpu_seconds)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _set_weak_etag(response):
+    # Otra representación del mismo recurso: el ETag pasa a ser débil
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    """
+    Comprime las respuestas HTML/JSON de más de min_size bytes si el cliente lo
+    acepta. Las respuestas en streaming se comprimen fragmento a fragmento (sin
+    mínimo de tamaño, que no se conoce de antemano). No toca los ficheros
+    enviados directamente ni las que ya llevan Content-Encoding.
+    """
+    if response.status_code == 304:
+        # Devolver el ETag tal como lo tiene el cliente (débil si recibió la versión comprimida)
+        etag, weak = response.get_etag()
+        if etag and not weak and request.if_none_match.is_weak(etag):
+            response.set_etag(etag, weak=True)
+        return response
+    if response.mimetype not in compression_settings['mimetypes']:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code < 200 or response.status_code == 204
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.headers.get('Cache-Control', '')):
+        return response
+
+    encoding = negotiate_encoding()
+    if response.is_streamed:
+        if encoding is None or not compression_settings['streaming']:
+            compression_stats.skip()
+            return response
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.headers['Content-Encoding'] = encoding
+        _set_weak_etag(response)
+        return response
+
+    data = response.get_data()
+    if encoding is None or len(data) < compression_settings['min_size']:
+        compression_stats.skip()
+        return response
+
+    started = time.thread_time()
+    compressed = compress(data, encoding)
+    cpu_seconds = time.thread_time() - started
+    if len(compressed) >= len(data):
+        compression_stats.skip()
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    _set_weak_etag(response)
+    compression_stats.record(encoding, len(data), len(compressed), cpu_seconds)
+    return response
+
+
+def is_fresh_sidecar(folder, filename, compressed_name):
+    """
+    Indica si existe la versión precomprimida de un fichero estático y no es
+    más antigua que el original (si se ha editado después, se envía el original
+    hasta volver a ejecutar scripts/precompress_static.py).
+    """
+    source = safe_join(folder, filename)
+    compressed = safe_join(folder, compressed_name)
+    if source is None or compressed is None:
+        return False
+    try:
+        return os.path.isfile(compressed) and os.path.getmtime(compressed) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def init_app(app):
+    """
+    Registra la compresión de respuestas y el envío de los ficheros estáticos
+    precomprimidos (.br/.gz junto al original) cuando el cliente los acepta.
+    """
+    compression_settings.update(
+        enabled=app.config.get('COMPRESSION_ENABLED', compression_settings['enabled']),
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', compression_settings['min_size']),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', compression_settings['gzip_level']),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', compression_settings['brotli_quality']),
+        streaming=app.config.get('COMPRESSION_STREAMING', compression_settings['streaming']),
+        mimetypes=tuple(app.config.get('COMPRESSION_MIMETYPES', compression_settings['mimetypes']))
+    )
+    if not compression_settings['enabled']:
+        return
+
+    app.after_request(compress_response)
+
+    static_view = app.view_functions.get('static')
+    if static_view is None or not app.static_folder:
+        return
+
+    def precompressed_static(filename):
+        for encoding in accepted_encodings():
+            compressed_name = filename + ENCODING_EXTENSIONS[encoding]
+            if is_fresh_sidecar(app.static_folder, filename, compressed_name):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(app.static_folder, compressed_name, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        response = static_view(filename=filename)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = precompressed_static
@@ -3,9 +3,241 @@ import base64
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.backends import default_backend
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import time
 import os
 
+def key_digest(key):
+    """Devuelve el SHA-256 (hex) de una clave, para identificarla sin guardarla"""
+    if isinstance(key, str):
+        key = key.encode()
+    return hashlib.sha256(key).hexdigest()
+
+
+class CipherCache:
+    """
+    Caché LRU de encriptadores indexada por el hash de la clave maestra.
+
+    Evita construir un objeto Fernet nuevo por cada fila cuando se cifran o
+    descifran muchas contraseñas con la misma clave.
+    """
+
+    def __init__(self, maxsize=256, ttl=900):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, maxsize=None, ttl=None):
+        """Ajusta el tamaño máximo y el TTL (en segundos) de la caché"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict_overflow()
+
+    def get(self, key):
+        """
+        Obtiene el encriptador asociado a una clave, creándolo si no existe.
+
+        Args:
+            key (str | bytes): Clave en formato compatible con Fernet
+
+        Returns:
+            PasswordEncryptor: Encriptador reutilizable para esa clave
+        """
+        digest = key_digest(key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                encryptor, expires_at = entry
+                if self.ttl and expires_at < now:
+                    del self._entries[digest]
+                    self.evictions += 1
+                else:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return encryptor
+            self.misses += 1
+
+        # Construir fuera del lock: Fernet valida la clave y no debe bloquear a otros hilos
+        encryptor = PasswordEncryptor(key.encode() if isinstance(key, str) else key)
+
+        with self._lock:
+            self._entries[digest] = (encryptor, now + self.ttl)
+            self._entries.move_to_end(digest)
+            self._evict_overflow()
+        return encryptor
+
+    def _evict_overflow(self):
+        while self.maxsize is not None and len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Elimina de la caché el encriptador de una clave (logout, rotación)"""
+        with self._lock:
+            return self._entries.pop(key_digest(key), None) is not None
+
+    def clear(self):
+        """Vacía la caché por completo"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Devuelve los contadores de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
+
+
+cipher_cache = CipherCache()
+
+# Formato de los textos cifrados nuevos. Los tokens Fernet anteriores se siguen
+# leyendo siempre; el sobre versionado es binario:
+#   versión (1 byte) | algoritmo (1 byte) | nonce (12 bytes) | texto cifrado + tag
+# La versión 0x03 deriva una subclave distinta para cada algoritmo; los sobres
+# 0x02 (una subclave común a todos) se siguen leyendo y se migran al reescribirse
+ENVELOPE_VERSION = 0x03
+ENVELOPE_VERSIONS = (0x02, 0x03)
+ENVELOPE_HKDF_INFO = b'guardiapass-envelope-v2'
+NONCE_LENGTH = 12
+ENVELOPE_ALGORITHMS = {
+    'aesgcm': (0x01, AESGCM),
+    'chacha20': (0x02, ChaCha20Poly1305)
+}
+ENVELOPE_ALGORITHM_IDS = {algorithm_id: algorithm for algorithm_id, algorithm in ENVELOPE_ALGORITHMS.values()}
+CIPHER_FORMATS = ('fernet',) + tuple(ENVELOPE_ALGORITHMS)
+cipher_settings = {
+    'format': 'aesgcm'
+}
+
+# Parámetros de derivación de claves para usuarios nuevos. Se guardan junto a
+# cada usuario, así que cambiarlos no afecta a las cuentas existentes.
+KDF_ALGORITHMS = ('pbkdf2-sha256', 'scrypt')
+kdf_settings = {
+    'algorithm': 'pbkdf2-sha256',
+    'iterations': 100000,
+    'salt_length': 16,
+    'scrypt_n': 2 ** 15,
+    'scrypt_r': 8,
+    'scrypt_p': 1
+}
+
+# Pool de hilos compartido para operaciones en lote (las primitivas de
+# cryptography liberan el GIL, por lo que los hilos sí trabajan en paralelo)
+batch_settings = {
+    'workers': min(4, os.cpu_count() or 1),
+    'threshold': 256
+}
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def init_app(app):
+    """Configura la caché y el pool de encriptación a partir de la configuración de Flask"""
+    global _batch_executor
+    cipher_format = app.config.get('CIPHER_FORMAT', cipher_settings['format'])
+    if cipher_format not in CIPHER_FORMATS:
+        raise ValueError(f"CIPHER_FORMAT debe ser uno de {', '.join(CIPHER_FORMATS)}")
+    cipher_settings['format'] = cipher_format
+    kdf_algorithm = app.config.get('KDF_ALGORITHM', kdf_settings['algorithm'])
+    if kdf_algorithm not in KDF_ALGORITHMS:
+        raise ValueError(f"KDF_ALGORITHM debe ser uno de {', '.join(KDF_ALGORITHMS)}")
+    kdf_settings.update(
+        algorithm=kdf_algorithm,
+        iterations=app.config.get('PBKDF2_ITERATIONS', kdf_settings['iterations']),
+        salt_length=app.config.get('SALT_LENGTH', kdf_settings['salt_length']),
+        scrypt_n=app.config.get('SCRYPT_N', kdf_settings['scrypt_n']),
+        scrypt_r=app.config.get('SCRYPT_R', kdf_settings['scrypt_r']),
+        scrypt_p=app.config.get('SCRYPT_P', kdf_settings['scrypt_p'])
+    )
+    cipher_cache.configure(
+        maxsize=app.config.get('CIPHER_CACHE_SIZE', 256),
+        ttl=app.config.get('CIPHER_CACHE_TTL', 900)
+    )
+    workers = app.config.get('CRYPTO_WORKERS', batch_settings['workers'])
+    with _batch_executor_lock:
+        if _batch_executor is not None and workers != batch_settings['workers']:
+            _batch_executor.shutdown(wait=False)
+            _batch_executor = None
+        batch_settings['workers'] = workers
+        batch_settings['threshold'] = app.config.get('CRYPTO_PARALLEL_THRESHOLD', batch_settings['threshold'])
+
+
+def _get_batch_executor():
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(
+                max_workers=batch_settings['workers'],
+                thread_name_prefix='crypto'
+            )
+        return _batch_executor
+
+
+def _apply_chunk(func, items, offset):
+    """Aplica func a cada elemento, registrando los fallos sin abortar el lote"""
+    results = []
+    errors = {}
+    for index, item in enumerate(items, start=offset):
+        try:
+            results.append(func(item))
+        except Exception as e:
+            results.append(None)
+            errors[index] = e
+    return results, errors
+
+
+def _map_batch(func, items):
+    """
+    Aplica func a todos los elementos conservando el orden.
+
+    Por encima del umbral configurado el trabajo se reparte en bloques
+    entre los hilos del pool.
+    """
+    items = list(items)
+    workers = batch_settings['workers']
+    if len(items) < batch_settings['threshold'] or workers <= 1:
+        return _apply_chunk(func, items, 0)
+
+    chunk_size = -(-len(items) // workers)
+    executor = _get_batch_executor()
+    futures = [
+        executor.submit(_apply_chunk, func, items[start:start + chunk_size], start)
+        for start in range(0, len(items), chunk_size)
+    ]
+
+    results = []
+    errors = {}
+    for future in futures:
+        chunk_results, chunk_errors = future.result()
+        results.extend(chunk_results)
+        errors.update(chunk_errors)
+    return results, errors
+
+
 class PasswordEncryptor:
     def __init__(self, key=None):
         """
@@ -16,58 +248,211 @@ class PasswordEncryptor:
             key = Fernet.generate_key()
         self.fernet = Fernet(key)
         self._key = key
+        self._aead = {}
     
+    @classmethod
+    def for_key(cls, key):
+        """
+        Obtiene un encriptador compartido para la clave indicada.
+
+        Args:
+            key (str | bytes): Clave en formato compatible con Fernet
+
+        Returns:
+            PasswordEncryptor: Encriptador cacheado
+        """
+        return cipher_cache.get(key)
+
     @property
     def key(self):
         """Retorna la clave de encriptación actual"""
         return self._key
     
-    def encrypt(self, password):
+    def _aead_cipher(self, algorithm_id, version=ENVELOPE_VERSION):
+        """Obtiene (y cachea) el cifrador AEAD del algoritmo y la versión del sobre"""
+        cipher = self._aead.get((version, algorithm_id))
+        if cipher is None:
+            # Derivar una subclave independiente para no reutilizar la clave de Fernet,
+            # ligada al algoritmo para que dos AEAD nunca compartan clave
+            info = ENVELOPE_HKDF_INFO
+            if version != 0x02:
+                info += bytes([algorithm_id])
+            hkdf = HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=info
+            )
+            subkey = hkdf.derive(base64.urlsafe_b64decode(self._key))
+            cipher = self._aead[(version, algorithm_id)] = ENVELOPE_ALGORITHM_IDS[algorithm_id](subkey)
+        return cipher
+    
+    @staticmethod
+    def is_legacy(encrypted_password):
+        """
+        Indica si un texto cifrado está en el formato Fernet anterior.
+        
+        Args:
+            encrypted_password (str | bytes): Contraseña encriptada
+            
+        Returns:
+            bool: True si no es un sobre versionado
+        """
+        if isinstance(encrypted_password, str):
+            return True
+        return bytes(encrypted_password[:1]) not in {bytes([version]) for version in ENVELOPE_VERSIONS}
+    
+    def encrypt(self, password, cipher_format=None):
         """
         Encripta una contraseña.
         
         Args:
             password (str): Contraseña a encriptar
+            cipher_format (str, optional): 'fernet', 'aesgcm' o 'chacha20'.
+                Por defecto el configurado en CIPHER_FORMAT
             
         Returns:
-            str: Contraseña encriptada en formato base64
+            bytes | str: Sobre binario versionado, o token Fernet en base64
+            si el formato es 'fernet'
         """
-        return self.fernet.encrypt(password.encode()).decode()
+        cipher_format = cipher_format or cipher_settings['format']
+        if cipher_format == 'fernet':
+            return self.fernet.encrypt(password.encode()).decode()
+        
+        algorithm_id, _ = ENVELOPE_ALGORITHMS[cipher_format]
+        nonce = os.urandom(NONCE_LENGTH)
+        header = bytes([ENVELOPE_VERSION, algorithm_id])
+        ciphertext = self._aead_cipher(algorithm_id).encrypt(nonce, password.encode(), header)
+        return header + nonce + ciphertext
     
     def decrypt(self, encrypted_password):
         """
-        Desencripta una contraseña.
+        Desencripta una contraseña, detectando automáticamente su formato.
         
         Args:
-            encrypted_password (str): Contraseña encriptada
+            encrypted_password (str | bytes): Contraseña encriptada
             
         Returns:
             str: Contraseña original
         """
-        return self.fernet.decrypt(encrypted_password.encode()).decode()
+        if self.is_legacy(encrypted_password):
+            if isinstance(encrypted_password, str):
+                encrypted_password = encrypted_password.encode()
+            return self.fernet.decrypt(bytes(encrypted_password)).decode()
+        
+        envelope = bytes(encrypted_password)
+        if envelope[1] not in ENVELOPE_ALGORITHM_IDS:
+            raise ValueError(f'Algoritmo de cifrado desconocido: {envelope[1]}')
+        
+        header = envelope[:2]
+        nonce = envelope[2:2 + NONCE_LENGTH]
+        ciphertext = envelope[2 + NONCE_LENGTH:]
+        return self._aead_cipher(envelope[1], envelope[0]).decrypt(nonce, ciphertext, header).decode()
+    
+    def needs_upgrade(self, encrypted_password):
+        """Indica si un texto cifrado debe reescribirse al formato configurado"""
+        if cipher_settings['format'] == 'fernet':
+            return False
+        return self.is_legacy(encrypted_password) or bytes(encrypted_password[:1]) != bytes([ENVELOPE_VERSION])
+    
+    def upgrade(self, encrypted_password):
+        """Reescribe un texto cifrado al formato configurado"""
+        return self.encrypt(self.decrypt(encrypted_password))
+    
+    def upgrade_many(self, encrypted_passwords):
+        """
+        Reescribe en lote varios textos cifrados al formato configurado.
+        
+        Returns:
+            tuple: (list, dict) Resultados en el mismo orden (None si falla) y
+            errores indexados por la posición del elemento
+        """
+        return _map_batch(self.upgrade, encrypted_passwords)
+    
+    def encrypt_many(self, passwords):
+        """
+        Encripta varias contraseñas en lote.
+        
+        Args:
+            passwords (iterable): Contraseñas a encriptar
+            
+        Returns:
+            tuple: (list, dict) Resultados en el mismo orden (None si falla) y
+            errores indexados por la posición del elemento
+        """
+        return _map_batch(self.encrypt, passwords)
+    
+    def decrypt_many(self, encrypted_passwords):
+        """
+        Desencripta varias contraseñas en lote.
+        
+        Args:
+            encrypted_passwords (iterable): Contraseñas encriptadas
+            
+        Returns:
+            tuple: (list, dict) Resultados en el mismo orden (None si falla) y
+            errores indexados por la posición del elemento
+        """
+        return _map_batch(self.decrypt, encrypted_passwords)
     
     @staticmethod
-    def generate_key_from_master(master_password, salt=None):
+    def default_kdf_params():
+        """
+        Devuelve los parámetros de derivación configurados para usuarios nuevos.
+        
+        Returns:
+            dict: Algoritmo, longitud del salt y parámetros de coste
+        """
+        if kdf_settings['algorithm'] == 'scrypt':
+            return {
+                'algorithm': 'scrypt',
+                'salt_length': kdf_settings['salt_length'],
+                'n': kdf_settings['scrypt_n'],
+                'r': kdf_settings['scrypt_r'],
+                'p': kdf_settings['scrypt_p']
+            }
+        return {
+            'algorithm': 'pbkdf2-sha256',
+            'salt_length': kdf_settings['salt_length'],
+            'iterations': kdf_settings['iterations']
+        }
+    
+    @staticmethod
+    def generate_key_from_master(master_password, salt=None, kdf_params=None):
         """
         Genera una clave de encriptación a partir de una contraseña maestra.
         
         Args:
             master_password (str): Contraseña maestra
             salt (bytes, optional): Salt para la derivación de la clave
+            kdf_params (dict, optional): Parámetros de derivación (ver
+                default_kdf_params). Por defecto los configurados
             
         Returns:
-            bytes: Clave derivada en formato compatible con Fernet
+            tuple: (bytes, bytes) Clave derivada en formato compatible con Fernet y salt
         """
+        if kdf_params is None:
+            kdf_params = PasswordEncryptor.default_kdf_params()
         if salt is None:
-            salt = os.urandom(16)
-            
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend()
-        )
+            salt = os.urandom(kdf_params.get('salt_length', 16))
+        
+        if kdf_params['algorithm'] == 'scrypt':
+            kdf = Scrypt(
+                salt=salt,
+                length=32,
+                n=kdf_params['n'],
+                r=kdf_params['r'],
+                p=kdf_params['p'],
+                backend=default_backend()
+            )
+        else:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=kdf_params['iterations'],
+                backend=default_backend()
+            )
         
         key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
         return key, salt
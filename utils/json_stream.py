@@ -0,0 +1,83 @@
+from flask import Response, current_app, stream_with_context
+
+# orjson es opcional: si está instalado se usa para codificar cada elemento
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_stream_settings = {
+    'buffer_size': 65536  # Bytes acumulados antes de enviar un bloque
+}
+
+
+def init_app(app):
+    """Configura el tamaño de bloque de las respuestas JSON en streaming"""
+    json_stream_settings['buffer_size'] = app.config.get('JSON_STREAM_BUFFER', json_stream_settings['buffer_size'])
+
+
+def json_encoder():
+    """
+    Devuelve una función que codifica un valor a bytes con el mismo resultado
+    que jsonify (fechas en formato HTTP, claves ordenadas), usando orjson si
+    está disponible.
+    """
+    provider = current_app.json
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if getattr(provider, 'sort_keys', False):
+            option |= orjson.OPT_SORT_KEYS
+        default = getattr(provider, 'default', None)
+        return lambda value: orjson.dumps(value, default=default, option=option)
+    return lambda value: provider.dumps(value).encode()
+
+
+def iter_json_array(items, buffer_size=None):
+    """
+    Codifica un iterable como array JSON elemento a elemento.
+
+    Yields:
+        bytes: Fragmentos de como mucho buffer_size bytes (más un elemento)
+    """
+    buffer_size = buffer_size or json_stream_settings['buffer_size']
+    encode = json_encoder()
+    buffer = [b'[']
+    size = 1
+    separator = b''
+    for item in items:
+        encoded = encode(item)
+        buffer.append(separator)
+        buffer.append(encoded)
+        size += len(encoded) + len(separator)
+        separator = b','
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    buffer.append(b']')
+    yield b''.join(buffer)
+
+
+def iter_json_object(key, items, extra=None, buffer_size=None):
+    """
+    Codifica un objeto JSON cuyo campo key es un array que se envía elemento a
+    elemento; los campos de extra se añaden al final.
+    """
+    encode = json_encoder()
+    yield b'{' + encode(key) + b':'
+    yield from iter_json_array(items, buffer_size)
+    tail = encode(extra or {})
+    yield b',' + tail[1:] if tail != b'{}' else b'}'
+
+
+def stream_json_array(items, buffer_size=None):
+    """
+    Respuesta que envía un array JSON a medida que se recorren los elementos,
+    de modo que la memoria usada no depende del número de elementos.
+    """
+    return Response(stream_with_context(iter_json_array(items, buffer_size)), mimetype='application/json')
+
+
+def stream_json_object(key, items, extra=None, buffer_size=None):
+    """Respuesta en streaming de un objeto JSON con un array grande en key"""
+    return Response(stream_with_context(iter_json_object(key, items, extra, buffer_size)), mimetype='application/json')
@@ -0,0 +1,150 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash
+from utils.encryptor import PasswordEncryptor
+
+
+class KDFSaturatedError(Exception):
+    """Se lanza cuando la cola del ejecutor de KDF está llena"""
+
+    def __init__(self, retry_after):
+        super().__init__('Demasiadas operaciones de derivación de claves en curso')
+        self.retry_after = retry_after
+
+
+def derive_user_secrets(password, kdf_params):
+    """
+    Deriva la clave maestra y el hash de la contraseña de un usuario nuevo.
+    Se ejecuta en un proceso del pool, por eso es una función de módulo y
+    recibe los parámetros de KDF explícitamente (el proceso hijo no tiene
+    la configuración de Flask).
+    """
+    master_key, salt = PasswordEncryptor.generate_key_from_master(password, kdf_params=kdf_params)
+    return master_key, salt, generate_password_hash(password)
+
+
+class KDFExecutor:
+    """
+    Pool de procesos dedicado a las operaciones costosas de derivación de
+    claves (PBKDF2, hashes de contraseñas), con una cola acotada.
+
+    Si la cola está llena se rechaza la tarea inmediatamente con
+    KDFSaturatedError en lugar de bloquear al worker que atiende la petición.
+    """
+
+    def __init__(self, workers=None, max_queue=32, retry_after=2):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._capacity())
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def _capacity(self):
+        return max(self.workers, 1) + self.max_queue
+
+    def configure(self, workers=None, max_queue=None, retry_after=None):
+        """Ajusta el tamaño del pool y de la cola"""
+        with self._lock:
+            if workers is not None and workers != self.workers:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+                self.workers = workers
+            if max_queue is not None:
+                self.max_queue = max_queue
+            if retry_after is not None:
+                self.retry_after = retry_after
+            self._slots = threading.BoundedSemaphore(self._capacity())
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def run(self, func, *args):
+        """
+        Ejecuta func(*args) en el pool y espera su resultado.
+
+        Raises:
+            KDFSaturatedError: Si no hay hueco en la cola
+        """
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise KDFSaturatedError(self.retry_after)
+
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        submitted = time.perf_counter()
+        started = None
+        try:
+            if self.workers <= 0:
+                # Sin pool (tests o scripts): ejecutar en el propio hilo
+                started = submitted
+                return func(*args)
+            result, started = self._get_executor().submit(_timed_call, func, args).result()
+            return result
+        finally:
+            slots.release()
+            self._record(submitted, started, time.perf_counter())
+
+    def _record(self, submitted, started, finished):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            if started is not None:
+                self.total_wait += max(started - submitted, 0.0)
+            latency = finished - submitted
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        """Devuelve las métricas de la cola y de latencia"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queue_depth': max(self.in_flight - self.workers, 0),
+                'max_in_flight': self.max_in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_wait_ms': (self.total_wait / self.completed * 1000) if self.completed else 0.0,
+                'avg_latency_ms': (self.total_latency / self.completed * 1000) if self.completed else 0.0,
+                'max_latency_ms': self.max_latency * 1000
+            }
+
+
+def _timed_call(func, args):
+    """Ejecuta la tarea en el proceso hijo devolviendo también cuándo empezó"""
+    return func(*args), time.perf_counter()
+
+
+kdf_executor = KDFExecutor()
+
+
+def init_app(app):
+    """Configura el ejecutor de KDF a partir de la configuración de Flask"""
+    kdf_executor.configure(
+        workers=app.config.get('KDF_WORKERS', os.cpu_count() or 1),
+        max_queue=app.config.get('KDF_MAX_QUEUE', 32),
+        retry_after=app.config.get('KDF_RETRY_AFTER', 2)
+    )
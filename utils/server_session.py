@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SecureCookieSession
+import re
+import secrets
+import threading
+
+SESSION_BACKENDS = ('cookie', 'memory', 'sqlite')
+
+# IDs de sesión válidos: los que genera secrets.token_urlsafe(32)
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{43}')
+
+
+def new_session_id():
+    """Genera un ID de sesión aleatorio y opaco"""
+    return secrets.token_urlsafe(32)
+
+
+class ServerSession(SecureCookieSession):
+    """
+    Sesión cuyos datos se guardan en el servidor; la cookie sólo lleva el ID.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        super().__init__(initial)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.expires_at = expires_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Cambia el ID de la sesión conservando los datos (al iniciar sesión)"""
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class MemorySessionBackend:
+    """
+    Sesiones en memoria con expulsión LRU. Sólo sirve con un único proceso.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid, now):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._entries[sid] = (data, expires_at)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > max(self.maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def sweep(self, now):
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for sid in expired:
+                del self._entries[sid]
+            return len(expired)
+
+    def count(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteSessionBackend:
+    """
+    Sesiones en la tabla session_record de la base de datos de la aplicación,
+    compartidas por todos los procesos.
+    """
+
+    def load(self, sid, now):
+        from models.session import SessionRecord
+        return SessionRecord.load(sid, now)
+
+    def save(self, sid, data, expires_at):
+        from models.session import SessionRecord
+        SessionRecord.save(sid, data, expires_at)
+
+    def delete(self, sid):
+        from models.session import SessionRecord
+        SessionRecord.delete(sid)
+
+    def sweep(self, now):
+        from models.session import SessionRecord
+        return SessionRecord.sweep(now)
+
+    def count(self):
+        from models.session import SessionRecord
+        return SessionRecord.count()
+
+
+class ServerSessionInterface(SessionInterface):
+    """
+    Interfaz de sesión de Flask que guarda los datos en un backend del servidor.
+
+    Las sesiones caducan PERMANENT_SESSION_LIFETIME después de su último uso.
+    Para no escribir en cada petición, la caducidad sólo se renueva cuando han
+    pasado touch_interval segundos desde la última renovación, y las sesiones
+    caducadas se eliminan como mucho cada sweep_interval segundos.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend, sweep_interval=300, touch_interval=60):
+        self.backend = backend
+        self.sweep_interval = timedelta(seconds=sweep_interval)
+        self.touch_interval = timedelta(seconds=touch_interval)
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = datetime.min
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+        self.swept = 0
+
+    def open_session(self, app, request):
+        now = datetime.utcnow()
+        self._maybe_sweep(now)
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID_PATTERN.fullmatch(sid):
+            record = self.backend.load(sid, now)
+            if record is not None:
+                data, expires_at = record
+                self.hits += 1
+                return ServerSession(self.serializer.loads(data), sid=sid, expires_at=expires_at)
+            self.misses += 1
+        # Un ID desconocido nunca se reutiliza: se asigna uno nuevo
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid is not None:
+            self.backend.delete(session.previous_sid)
+
+        # Sesión vaciada (logout): se borra del backend y se elimina la cookie
+        if not session:
+            if session.modified:
+                if not session.new:
+                    self.backend.delete(session.sid)
+                response.delete_cookie(
+                    name,
+                    domain=domain,
+                    path=path,
+                    secure=secure,
+                    partitioned=partitioned,
+                    samesite=samesite,
+                    httponly=httponly
+                )
+                response.vary.add('Cookie')
+            return
+
+        now = datetime.utcnow()
+        expires_at = now + app.permanent_session_lifetime
+        refresh = session.expires_at is None or expires_at - session.expires_at >= self.touch_interval
+        if not (session.modified or refresh):
+            return
+
+        self.backend.save(session.sid, self.serializer.dumps(dict(session)), expires_at)
+        self.saves += 1
+        if session.modified or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                partitioned=partitioned,
+                samesite=samesite
+            )
+            response.vary.add('Cookie')
+
+    def _maybe_sweep(self, now):
+        """Elimina las sesiones caducadas si ha pasado sweep_interval desde la última vez"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            self.swept += self.backend.sweep(now)
+        finally:
+            self._sweep_lock.release()
+
+    def stats(self):
+        """Devuelve los contadores del almacén de sesiones"""
+        return {
+            'backend': type(self.backend).__name__,
+            'sessions': self.backend.count(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'saves': self.saves,
+            'swept': self.swept
+        }
+
+
+def regenerate_session():
+    """
+    Asigna un ID nuevo a la sesión actual (evita la fijación de sesión al
+    iniciar sesión). Con sesiones en cookie no hace nada.
+    """
+    if isinstance(session._get_current_object(), ServerSession):
+        session.regenerate()
+
+
+def init_app(app):
+    """Instala el almacén de sesiones configurado en SESSION_BACKEND"""
+    backend_name = app.config.get('SESSION_BACKEND', 'cookie')
+    if backend_name not in SESSION_BACKENDS:
+        raise ValueError(f"SESSION_BACKEND debe ser uno de {', '.join(SESSION_BACKENDS)}")
+    if backend_name == 'cookie':
+        return
+    if backend_name == 'memory':
+        backend = MemorySessionBackend(app.config.get('SESSION_MEMORY_MAX', 10000))
+    else:
+        backend = SQLiteSessionBackend()
+    app.session_interface = ServerSessionInterface(
+        backend,
+        sweep_interval=app.config.get('SESSION_SWEEP_INTERVAL', 300),
+        touch_interval=app.config.get('SESSION_TOUCH_INTERVAL', 60)
+    )
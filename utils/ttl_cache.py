@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import threading
+import time
+
+class TTLCache:
+    """
+    Caché LRU en memoria con caducidad, indexada por una clave arbitraria
+    (normalmente el ID del usuario).
+
+    Los valores se calculan bajo demanda con la función que recibe get() y se
+    descartan al caducar o al invalidarlos tras una escritura. Un valor cuyo
+    cálculo coincide con una invalidación de su clave no se guarda, porque
+    puede haberse leído antes de la escritura.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # Claves que se están calculando: clave -> [generación, cálculos en curso].
+        # invalidate() incrementa la generación de las que estén en la lista
+        self._computing = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, maxsize=None, ttl=None):
+        """Ajusta el tamaño máximo y el TTL (en segundos) de la caché"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._evict_overflow()
+
+    def get(self, key, compute):
+        """
+        Devuelve el valor asociado a la clave, calculándolo con compute(key) si
+        no está en caché o ha caducado. Los resultados None no se guardan.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not (self.ttl and entry[1] < now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            state = self._computing.setdefault(key, [0, 0])
+            state[1] += 1
+            generation = state[0]
+
+        # Calcular fuera del lock: puede consultar la base de datos
+        try:
+            value = compute(key)
+        except Exception:
+            with self._lock:
+                self._finish_compute(key, state)
+            raise
+
+        with self._lock:
+            self._finish_compute(key, state)
+            # Invalidada durante el cálculo: el valor puede ser anterior a la escritura
+            if value is None or state[0] != generation:
+                return value
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+        return value
+
+    def _finish_compute(self, key, state):
+        state[1] -= 1
+        if not state[1]:
+            del self._computing[key]
+
+    def _evict_overflow(self):
+        while self.maxsize is not None and len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Descarta el valor de una clave tras una escritura"""
+        with self._lock:
+            self.invalidations += 1
+            if key in self._computing:
+                self._computing[key][0] += 1
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """Vacía la caché por completo"""
+        with self._lock:
+            self._entries.clear()
+            for state in self._computing.values():
+                state[0] += 1
+
+    def stats(self):
+        """Devuelve los contadores de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+import sys
+import threading
+
+def estimate_size(value):
+    """
+    Estima los bytes que ocupa en memoria un valor formado por diccionarios,
+    listas, tuplas y valores simples (sys.getsizeof de cada objeto anidado).
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class VersionedLRUCache:
+    """
+    Caché LRU en memoria limitada por el tamaño total estimado de sus valores
+    (max_bytes) en lugar de por número de entradas.
+
+    Cada entrada guarda la versión de los datos con la que se calculó: get()
+    sólo la devuelve si coincide con la versión actual que recibe, así que una
+    entrada desactualizada nunca se sirve aunque no se haya invalidado.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, sizeof=estimate_size):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # clave -> [versión, valor, bytes]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.updates = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes=None):
+        """Ajusta el tamaño máximo de la caché (0 la desactiva)"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict_overflow()
+
+    @property
+    def enabled(self):
+        return bool(self.max_bytes)
+
+    def get(self, key, version, compute):
+        """
+        Devuelve el valor de la clave si está en caché con la versión indicada;
+        si no, lo calcula con compute(key) y lo guarda con esa versión.
+        La versión debe leerse antes que los datos que calcula compute.
+        Los resultados None no se guardan.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self.stale += 1
+            self.misses += 1
+
+        # Calcular fuera del lock: puede consultar la base de datos
+        value = compute(key)
+        if value is None or not self.max_bytes:
+            return value
+
+        size = self._sizeof(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            # No sustituir una entrada que una escritura ya ha dejado más reciente
+            if entry is not None and entry[0] > version:
+                return value
+            if size > self.max_bytes:
+                self._discard(key)
+                return value
+            self._discard(key)
+            self._entries[key] = [version, value, size]
+            self._bytes += size
+            self._evict_overflow()
+        return value
+
+    def update(self, key, base_version, version, mutate):
+        """
+        Aplica una escritura a la entrada en caché (write-through).
+
+        mutate(value) devuelve (nuevo_valor, variación del tamaño en bytes) sin
+        modificar value, que otros hilos pueden estar recorriendo. Sólo se
+        aplica si la entrada está en base_version, la versión inmediatamente
+        anterior a la escritura; si no (otra escritura se ha adelantado), la
+        entrada se descarta.
+
+        Returns:
+            bool: True si la entrada se ha actualizado
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if entry[0] != base_version:
+                self._discard(key)
+                self.invalidations += 1
+                return False
+            entry[1], delta = mutate(entry[1])
+            entry[0] = version
+            entry[2] += delta
+            self._bytes += delta
+            self.updates += 1
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+            return True
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry is not None
+
+    def _evict_overflow(self):
+        while self._entries and self._bytes > max(self.max_bytes or 0, 0):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
+
+    def invalidate(self, key):
+        """Descarta el valor de una clave"""
+        with self._lock:
+            self.invalidations += 1
+            return self._discard(key)
+
+    def clear(self):
+        """Vacía la caché por completo"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Devuelve los contadores de la caché (stale: entradas con versión antigua)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'updates': self.updates,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }